@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy import update, bindparam
+
+logger = logging.getLogger(__name__)
+
+class ActivityBuffer:
+    """Накапливает обновления last_active и пишет их в БД пачками.
+
+    Повторные обращения одного пользователя между сбросами схлопываются
+    в одну запись с самым поздним временем.
+    """
+
+    def __init__(self, session_factory, user_table, flush_interval: float = 5.0):
+        self._session_factory = session_factory
+        self._table = user_table
+        self._flush_interval = flush_interval
+        self._pending: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, telegram_id: int, when: Optional[datetime] = None):
+        """Отмечает активность пользователя без обращения к БД."""
+        when = when or datetime.now(timezone.utc)
+        current = self._pending.get(telegram_id)
+        if current is None or when > current:
+            self._pending[telegram_id] = when
+
+    def get(self, telegram_id: int) -> Optional[datetime]:
+        """Возвращает еще не записанное время активности пользователя."""
+        return self._pending.get(telegram_id)
+
+    async def flush(self):
+        """Записывает накопленные обновления одним пакетным UPDATE."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        stmt = (
+            update(self._table)
+            .where(self._table.c.telegram_id == bindparam("b_telegram_id"))
+            .values(last_active=bindparam("b_last_active"))
+        )
+        params = [
+            {"b_telegram_id": telegram_id, "b_last_active": last_active}
+            for telegram_id, last_active in pending.items()
+        ]
+        try:
+            async with self._session_factory() as db:
+                await db.execute(stmt, params)
+                await db.commit()
+            logger.debug(f"Flushed activity for {len(params)} users")
+        except Exception as e:
+            logger.error(f"Error flushing user activity: {e}")
+            self._restore(pending)
+        except BaseException:
+            # Отмена посреди записи (stop() отменяет фоновую задачу): пачка
+            # возвращается в буфер и пишется следующим сбросом. Повторная
+            # запись того же времени безвредна, даже если коммит успел пройти
+            self._restore(pending)
+            raise
+
+    def _restore(self, pending: Dict[int, datetime]):
+        """Возвращает обновления в буфер, не затирая более свежие."""
+        for telegram_id, last_active in pending.items():
+            self.touch(telegram_id, last_active)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Запускает периодический сброс буфера."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую задачу и сбрасывает остаток буфера."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
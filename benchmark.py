@@ -0,0 +1,878 @@
+"""Нагрузочный бенчмарк API на больших наборах данных.
+
+Заполняет базу (SQLite или Postgres из DATABASE_URL) пользователями,
+мероприятиями, опросами и голосами, затем запускает приложение FastAPI
+в этом же процессе и нагружает эндпоинты через httpx.ASGITransport.
+Обработчик /start бота получает синтетические обновления, ответы Bot API
+подменяются без обращения к сети.
+Результаты (p50/p95/p99, RPS) сохраняются в JSON для сравнения между
+коммитами.
+
+Пример:
+    DATABASE_URL=sqlite:///./bench.db python benchmark.py --requests 1000 --concurrency 50
+    python benchmark.py --users 1000 --events 10000 --polls 500 --votes 100000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+CATEGORIES = ["meeting", "concert", "exhibition", "sport", "other"]
+WORDS = [
+    "музыка", "встреча", "выставка", "турнир", "лекция", "концерт", "фестиваль",
+    "мастер-класс", "кино", "театр", "футбол", "шахматы", "джаз", "книги", "город"
+]
+OPTIONS_PER_POLL = 4
+# Редкие слова для сценария поиска: каждый тег встречается в ~1/SEARCH_TAGS мероприятий
+SEARCH_TAGS = 1000
+TELEGRAM_ID_BASE = 1_000_000
+SERIALIZED_EVENTS = 1000
+# Страница списка мероприятий в сценариях get_events: полный список на 1M мероприятий не отдается
+EVENTS_PAGE_SIZE = 100
+REMINDER_USERS = 1000
+REMINDER_EVENTS = 10_000
+# Срочные напоминания срабатывают равномерно в течение окна, начиная через REMINDER_DUE_LEAD секунд
+REMINDER_DUE_LEAD = 2
+REMINDER_DUE_WINDOW = 10
+SERIALIZATION_SCENARIOS = ("serialize_events orm+jsonable_encoder", "serialize_events rows+orjson")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="API load benchmark")
+    parser.add_argument("--database-url", default=None, help="по умолчанию DATABASE_URL или sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--polls", type=int, default=50_000)
+    parser.add_argument("--votes", type=int, default=10_000_000)
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="строк в одной пачке вставки")
+    parser.add_argument("--reseed", action="store_true", help="пересоздать таблицы и данные")
+    parser.add_argument("--no-search-index", action="store_true", help="без поискового индекса (поиск через ILIKE)")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--serialization-rounds", type=int, default=50, help="повторов замера сериализации")
+    parser.add_argument("--vote-concurrency", type=int, default=200, help="одновременных голосов в сценарии vote_ingest")
+    parser.add_argument("--live-subscribers", type=int, default=5000, help="подписчиков SSE в сценарии live_fanout")
+    parser.add_argument("--live-rounds", type=int, default=5, help="рассылок в сценарии live_fanout")
+    parser.add_argument("--reminders", type=int, default=1_000_000, help="ожидающих напоминаний в сценарии reminders")
+    parser.add_argument("--reminders-due", type=int, default=1000, help="напоминаний, срабатывающих во время сценария")
+    parser.add_argument("--warmup", type=int, default=20, help="неучитываемых запросов перед сценарием")
+    parser.add_argument("--scenario", action="append", default=None, help="запустить только сценарии с этим префиксом")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора данных")
+    parser.add_argument("--output", default=None, help="файл результатов JSON")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Настройки окружения, которые нужно задать до импорта приложения."""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    os.environ.setdefault("JWT_SECRET", "benchmark")
+    # Бот работает с поддельным Bot API, настоящий токен не нужен
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+    os.environ["BOT_MODE"] = "polling"
+    # Бенчмарк измеряет обработку запросов, а не ограничение частоты
+    for name in ("RATE_LIMIT_AUTH", "RATE_LIMIT_VOTE", "RATE_LIMIT_EVENTS"):
+        os.environ[name] = "1000000000/60"
+
+def chunked(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+async def bulk_insert(conn, table, rows):
+    """Вставка пачки строк: COPY в Postgres, executemany в SQLite."""
+    if conn.dialect.name == "postgresql":
+        columns = list(rows[0].keys())
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name, records=[tuple(row[c] for c in columns) for row in rows], columns=columns
+        )
+    else:
+        from sqlalchemy import insert
+        await conn.execute(insert(table), rows)
+
+def user_rows(count, rng, now):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "telegram_id": TELEGRAM_ID_BASE + i,
+            "username": f"user{i}",
+            "created_at": now - timedelta(days=rng.randint(90, 720)),
+            "last_active": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+            "is_admin": False,
+        }
+
+def event_rows(count, rng, now):
+    for i in range(1, count + 1):
+        title_words = rng.sample(WORDS, 3)
+        yield {
+            "id": i,
+            "title": " ".join(title_words).capitalize(),
+            "description": " ".join(rng.choices(WORDS, k=12) + [f"тег{rng.randrange(SEARCH_TAGS):03d}"]),
+            "date": now + timedelta(minutes=rng.randint(-365 * 1440, 365 * 1440)),
+            "location": f"Зал {rng.randint(1, 50)}",
+            "category": rng.choice(CATEGORIES),
+            "created_at": now - timedelta(days=rng.randint(1, 400)),
+            "created_by": None,
+        }
+
+def poll_block_rows(first_poll_id, last_poll_id, votes_per_poll, users, rng, now):
+    """Опросы, варианты и голоса для диапазона опросов.
+
+    Голоса каждого опроса отдаются разными пользователями, счетчики
+    вариантов совпадают с числом голосов.
+    """
+    polls, options, votes = [], [], []
+    for poll_id in range(first_poll_id, last_poll_id + 1):
+        polls.append({
+            "id": poll_id,
+            "title": f"Опрос {poll_id}",
+            "description": " ".join(rng.choices(WORDS, k=8)),
+            "end_date": now + timedelta(days=rng.randint(-180, 180)),
+            "created_at": now - timedelta(days=rng.randint(1, 365)),
+            "created_by": None,
+        })
+        option_ids = [(poll_id - 1) * OPTIONS_PER_POLL + n for n in range(1, OPTIONS_PER_POLL + 1)]
+        counts = dict.fromkeys(option_ids, 0)
+        for user_index in rng.sample(range(1, users + 1), min(votes_per_poll, users)):
+            option_id = rng.choice(option_ids)
+            counts[option_id] += 1
+            votes.append({
+                "poll_id": poll_id,
+                "user_id": TELEGRAM_ID_BASE + user_index,
+                "option_id": option_id,
+                "created_at": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+            })
+        options.extend(
+            {"id": option_id, "poll_id": poll_id, "text": f"Вариант {n}", "votes_count": counts[option_id]}
+            for n, option_id in enumerate(option_ids, 1)
+        )
+    return polls, options, votes
+
+async def seed(webapp, args):
+    """Заполняет базу данными, если она пуста (или при --reseed)."""
+    from sqlalchemy import func, select
+    from config import settings
+    from database import engine, write_engine, init_models
+    from search import create_search_index, drop_search_index, search_index_exists
+
+    if args.reseed:
+        async with write_engine.begin() as conn:
+            await conn.run_sync(webapp.Base.metadata.drop_all)
+    await init_models(webapp.Base.metadata)
+
+    async with engine.connect() as conn:
+        seeded = await conn.scalar(select(func.count()).select_from(webapp.User.__table__))
+    if seeded:
+        print("Database is not empty, reusing existing data (use --reseed to recreate)")
+    else:
+        await seed_data(webapp, args)
+
+    # Поисковый индекс, как после миграции add_events_search
+    started = time.perf_counter()
+    async with write_engine.begin() as conn:
+        exists = await conn.run_sync(search_index_exists)
+        if exists and args.no_search_index:
+            await conn.run_sync(drop_search_index)
+        elif not exists and not args.no_search_index:
+            await conn.run_sync(create_search_index, settings.SEARCH_LANGUAGE)
+            print(f"Search index built in {time.perf_counter() - started:.1f}s")
+
+async def seed_data(webapp, args):
+    from sqlalchemy import text
+    from database import write_engine
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    async with write_engine.begin() as conn:
+        for chunk in chunked(user_rows(args.users, rng, now), args.chunk_size):
+            await bulk_insert(conn, webapp.User.__table__, chunk)
+        print(f"Seeded {args.users} users")
+
+        for chunk in chunked(event_rows(args.events, rng, now), args.chunk_size):
+            await bulk_insert(conn, webapp.Event.__table__, chunk)
+        print(f"Seeded {args.events} events")
+
+        votes_per_poll = args.votes // max(args.polls, 1)
+        polls_per_block = max(1, args.chunk_size // max(votes_per_poll, 1))
+        for first in range(1, args.polls + 1, polls_per_block):
+            last = min(first + polls_per_block - 1, args.polls)
+            polls, options, votes = poll_block_rows(first, last, votes_per_poll, args.users, rng, now)
+            await bulk_insert(conn, webapp.Poll.__table__, polls)
+            await bulk_insert(conn, webapp.PollOption.__table__, options)
+            for chunk in chunked(votes, args.chunk_size):
+                await bulk_insert(conn, webapp.Vote.__table__, chunk)
+        print(f"Seeded {args.polls} polls with {votes_per_poll * args.polls} votes")
+
+        if conn.dialect.name == "postgresql":
+            # Явные id не двигают последовательности
+            for table in ("users", "events", "polls", "poll_options", "votes"):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+                ))
+    print(f"Seeding finished in {time.perf_counter() - started:.1f}s")
+
+async def create_vote_poll(webapp) -> int:
+    """Новый опрос без голосов для сценария голосования.
+
+    Создается при каждом запуске, чтобы голоса на уже заполненной базе
+    не оказывались повторными.
+    """
+    async with webapp.SessionLocal() as db:
+        poll = webapp.Poll(
+            title="Benchmark", description="",
+            end_date=datetime.now(timezone.utc) + timedelta(days=3650),
+            options=[webapp.PollOption(text=f"Вариант {n}") for n in range(1, OPTIONS_PER_POLL + 1)]
+        )
+        db.add(poll)
+        await db.commit()
+        return poll.id
+
+def percentile(sorted_values, p):
+    """Процентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+async def run_scenario(client, name, make_request, args, counter):
+    """Выполняет запросы сценария с заданной конкурентностью."""
+    latencies, statuses = [], {}
+
+    async def worker(remaining, record):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            method, url, kwargs = make_request(next(counter))
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
+            if record:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await worker([args.warmup], False)
+    remaining = [args.requests]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(remaining, True) for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if status >= 400)
+    result = {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 1) if duration else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "errors": errors,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+    }
+    print(
+        f"{name:<55} rps={result['rps']:>8} p50={result['p50_ms']:>8}ms "
+        f"p95={result['p95_ms']:>8}ms p99={result['p99_ms']:>8}ms errors={errors}"
+    )
+    return result
+
+def scenario_selected(args, name) -> bool:
+    """Сценарий выбран параметром --scenario (без параметра выбраны все)."""
+    return not args.scenario or any(name.startswith(p) for p in args.scenario)
+
+def build_scenarios(args, webapp, vote_poll_id):
+    """Сценарии: имя -> функция (номер запроса) -> (метод, URL, параметры)."""
+    import jwt
+
+    scenarios = {}
+    month = datetime.now(timezone.utc).month
+    for type_, category, month_filter, search in itertools.product(
+        ("upcoming", "past"), (None, "concert"), (None, month), (None, "музыка")
+    ):
+        params = {"type": type_, "limit": EVENTS_PAGE_SIZE}
+        if category:
+            params["category"] = category
+        if month_filter:
+            params["month"] = month_filter
+        if search:
+            params["search"] = search
+        name = "get_events " + " ".join(f"{k}={v}" for k, v in params.items())
+        scenarios[name] = lambda i, params=params: ("GET", "/api/events", {"params": params})
+
+    # Поиск по редкому слову: измеряет сам поиск, а не вывод большой выборки
+    scenarios["search_events tag"] = lambda i: (
+        "GET", "/api/events", {"params": {"type": "upcoming", "search": f"тег{i % SEARCH_TAGS:03d}"}}
+    )
+
+    scenarios["get_polls"] = lambda i: ("GET", "/api/polls", {})
+
+    # Каждый запрос голосует от нового пользователя в опросе без голосов
+    tokens = {}
+
+    def vote_request(i):
+        user_index = i % args.users + 1
+        token = tokens.get(user_index)
+        if token is None:
+            token = tokens[user_index] = jwt.encode(
+                {"user_id": TELEGRAM_ID_BASE + user_index}, os.environ["JWT_SECRET"], algorithm="HS256"
+            )
+        return "POST", f"/api/polls/{vote_poll_id}/vote", {
+            "json": {"optionIndex": i % OPTIONS_PER_POLL},
+            "headers": {"Authorization": f"Bearer {token}"},
+        }
+    scenarios["vote_in_poll"] = vote_request
+
+    scenarios["get_stats cached"] = lambda i: ("GET", "/api/stats", {})
+
+    def uncached_stats_request(i):
+        # Сбрасываем снимок перед каждым запросом, чтобы измерять сами агрегаты
+        webapp.stats_snapshot.invalidate()
+        return "GET", "/api/stats", {}
+    scenarios["get_stats uncached"] = uncached_stats_request
+    scenarios["get_users_stats"] = lambda i: ("GET", "/api/admin/users", {"params": {"limit": 100}})
+
+    return {name: make_request for name, make_request in scenarios.items() if scenario_selected(args, name)}
+
+def make_offline_request():
+    """Bot API без сети: getMe и sendMessage отвечают готовыми данными."""
+    from telegram.request import BaseRequest
+
+    class OfflineBotRequest(BaseRequest):
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            if url.rsplit("/", 1)[-1] == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+            else:
+                chat_id = int(request_data.parameters["chat_id"])
+                result = {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}}
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    return OfflineBotRequest()
+
+def start_update(update_id, telegram_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            "chat": {"id": telegram_id, "type": "private"},
+            "from": {"id": telegram_id, "is_bot": False, "first_name": "User"},
+        },
+    }
+
+async def run_bot_scenario(application, name, telegram_ids, args):
+    """Пропускает синтетические обновления /start через обработчики бота."""
+    from telegram import Update
+    import metrics
+
+    latencies, queries, errors = [], [], 0
+    pending = iter(enumerate(telegram_ids))
+
+    async def worker():
+        nonlocal errors
+        for update_id, telegram_id in pending:
+            update = Update.de_json(start_update(update_id, telegram_id), application.bot)
+            # Счетчик запросов к БД из metrics.py, как для HTTP-запроса
+            db_stats = [0, 0.0]
+            token = metrics.request_db_stats.set(db_stats)
+            start = time.perf_counter()
+            try:
+                await application.process_update(update)
+            except Exception:
+                errors += 1
+            finally:
+                latencies.append(time.perf_counter() - start)
+                metrics.request_db_stats.reset(token)
+            queries.append(db_stats[0])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "updates": len(latencies),
+        "concurrency": args.concurrency,
+        "duration_s": round(duration, 3),
+        "updates_per_s": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "db_queries_per_update": round(sum(queries) / len(queries), 2),
+        "errors": errors,
+    }
+    print(
+        f"{name:<55} ups={result['updates_per_s']:>8} p50={result['p50_ms']:>8}ms "
+        f"p95={result['p95_ms']:>8}ms queries/update={result['db_queries_per_update']} errors={errors}"
+    )
+    return result
+
+async def bot_benchmarks(args):
+    """/start для новых пользователей (вставка в БД) и повторный /start (кеш известных)."""
+    from telegram.ext import Application, CommandHandler
+    import bot
+
+    application = (
+        Application.builder().token(os.environ["BOT_TOKEN"]).request(make_offline_request()).updater(None).build()
+    )
+    application.add_handler(CommandHandler("start", bot.start))
+    await application.initialize()
+    # Журнал каждого /start на уровне INFO измерял бы скорость логирования
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    try:
+        # id за пределами заполненных пользователей: каждый /start регистрирует нового
+        first_new = TELEGRAM_ID_BASE + args.users + int(time.time())
+        new_ids = list(range(first_new, first_new + args.requests))
+        results = {}
+        for name in ("bot_start new users", "bot_start known users"):
+            if not scenario_selected(args, name):
+                continue
+            if name == "bot_start known users" and "bot_start new users" not in results:
+                # Известными пользователи становятся после первого /start
+                for telegram_id in new_ids:
+                    await bot.register_user(telegram_id)
+            results[name] = await run_bot_scenario(application, name, new_ids, args)
+    finally:
+        await application.shutdown()
+    return results
+
+def run_serialization(webapp, events_orm, event_rows, args):
+    """Время сериализации мероприятий: ORM + jsonable_encoder против строк + модели ответа + orjson."""
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(List[webapp.EventResult])
+
+    def before():
+        # Прежний путь: ORM-объекты без response_model
+        return JSONResponse(jsonable_encoder(events_orm)).body
+
+    def after():
+        # Текущий путь get_events: строки, проверка EventResult, orjson
+        return ORJSONResponse(adapter.dump_python(adapter.validate_python(event_rows), mode="json")).body
+
+    results = {}
+    for name, render in zip(SERIALIZATION_SCENARIOS, (before, after)):
+        if not scenario_selected(args, name):
+            continue
+        render()
+        timings = []
+        for _ in range(args.serialization_rounds):
+            start = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results[name] = {
+            "events": len(event_rows),
+            "rounds": args.serialization_rounds,
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        }
+        print(f"{name:<55} p50={results[name]['p50_ms']:>8}ms p95={results[name]['p95_ms']:>8}ms per {len(event_rows)} events")
+    return results
+
+async def serialization_benchmarks(webapp, args):
+    """Сериализация ответа get_events на SERIALIZED_EVENTS мероприятиях; чтение из БД в замер не входит."""
+    from sqlalchemy import select
+    from database import SessionLocal
+
+    Event = webapp.Event
+    if not any(scenario_selected(args, name) for name in SERIALIZATION_SCENARIOS):
+        return {}
+    async with SessionLocal() as db:
+        events_orm = (await db.scalars(select(Event).order_by(Event.id).limit(SERIALIZED_EVENTS))).all()
+        event_rows = (await db.execute(
+            select(Event.id, Event.title, Event.description, Event.date, Event.location, Event.category)
+            .order_by(Event.id).limit(SERIALIZED_EVENTS)
+        )).mappings().all()
+    return run_serialization(webapp, events_orm, event_rows, args)
+
+async def vote_ingest_benchmark(webapp, args):
+    """Пропускная способность приема голосов без HTTP-слоя.
+
+    Каждый пользователь голосует один раз в новом опросе, голоса подаются
+    в VoteIngestor с конкурентностью --vote-concurrency. Вместе со
+    сценарием vote_in_poll показывает, сколько стоит запись пачек, а
+    сколько обработка HTTP-запроса.
+    """
+    from config import settings
+    from votes import VoteIngestor
+
+    name = "vote_ingest"
+    if not scenario_selected(args, name):
+        return {}
+    batches = []
+
+    class MeasuredIngestor(VoteIngestor):
+        async def _write_batch(self, batch):
+            start = time.perf_counter()
+            await super()._write_batch(batch)
+            batches.append((len(batch), time.perf_counter() - start))
+
+    # Те же параметры, что у webapp.vote_ingestor, кроме рассылки живых результатов
+    ingestor = MeasuredIngestor(
+        webapp.SessionLocal,
+        (webapp.Poll, webapp.PollOption, webapp.Vote, webapp.User),
+        on_write=lambda db, poll_ids: webapp.bump_versions(db, "polls"),
+        batch_size=settings.VOTE_BATCH_SIZE,
+        max_delay=settings.VOTE_BATCH_DELAY
+    )
+    poll_id = await create_vote_poll(webapp)
+    user_indexes = iter(range(1, args.users + 1))
+    latencies, statuses = [], {}
+
+    async def voter():
+        for user_index in user_indexes:
+            start = time.perf_counter()
+            status = await ingestor.submit(poll_id, TELEGRAM_ID_BASE + user_index, user_index % OPTIONS_PER_POLL)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    ingestor.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(voter() for _ in range(args.vote_concurrency)))
+    finally:
+        await ingestor.stop()
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    flush_times = sorted(elapsed for _, elapsed in batches)
+    result = {
+        "votes": len(latencies),
+        "concurrency": args.vote_concurrency,
+        "duration_s": round(duration, 3),
+        "votes_per_s": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "batches": len(batches),
+        "mean_batch_size": round(sum(size for size, _ in batches) / len(batches), 1),
+        "flush_p50_ms": round(percentile(flush_times, 50) * 1000, 2),
+        "flush_p99_ms": round(percentile(flush_times, 99) * 1000, 2),
+        "statuses": statuses,
+    }
+    print(
+        f"{name:<55} votes/s={result['votes_per_s']:>8} p50={result['p50_ms']:>8}ms p99={result['p99_ms']:>8}ms "
+        f"batch={result['mean_batch_size']} flush p50={result['flush_p50_ms']}ms"
+    )
+    return {name: result}
+
+class LiveClient:
+    """Неактивный подписчик /api/polls/live, подключенный к приложению напрямую по ASGI.
+
+    httpx.ASGITransport ждет окончания ответа, а поток SSE бесконечен,
+    поэтому запрос и чтение событий выполняются без клиента.
+    """
+
+    def __init__(self, app, poll_id: int, on_results):
+        self.status = None
+        self.results = 0
+        self._app = app
+        self._poll_id = poll_id
+        self._on_results = on_results
+        self._request_sent = False
+        self._disconnected = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/polls/live", "raw_path": b"/api/polls/live", "root_path": "",
+            "query_string": f"ids={self._poll_id}".encode(), "headers": [(b"host", b"benchmark")],
+            "client": ("127.0.0.1", 0), "server": ("benchmark", 80),
+        }
+        self._task = asyncio.create_task(self._app(scope, self._receive, self._send))
+
+    async def close(self):
+        self._disconnected.set()
+        try:
+            await self._task
+        except Exception:
+            pass
+
+    async def _receive(self):
+        if not self._request_sent:
+            self._request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            if self.status != 200:
+                self._on_results(self)
+        elif message["type"] == "http.response.body" and b"event: results" in message.get("body", b""):
+            self.results += 1
+            self._on_results(self)
+
+async def live_benchmark(webapp, args):
+    """Рассылка результатов опроса тысячам неактивных подписчиков SSE.
+
+    Измеряет память на соединение (tracemalloc, после открытия всех
+    соединений) и задержку от publish() до получения события каждым
+    подписчиком. Задержка включает интервал объединения изменений
+    LIVE_COALESCE_INTERVAL.
+    """
+    import gc
+    import tracemalloc
+    from config import settings
+
+    name = "live_fanout"
+    if not scenario_selected(args, name):
+        return {}
+    poll_id = await create_vote_poll(webapp)
+    subscribers = args.live_subscribers
+    arrivals = []
+    expected = [0, asyncio.Event()]
+
+    def on_results(client):
+        arrivals.append(time.perf_counter())
+        if len(arrivals) >= expected[0]:
+            expected[1].set()
+
+    async def wait_for_arrivals(count):
+        expected[0], expected[1] = count, asyncio.Event()
+        if len(arrivals) < count:
+            await asyncio.wait_for(expected[1].wait(), timeout=120)
+
+    clients = [LiveClient(webapp.app, poll_id, on_results) for _ in range(subscribers)]
+    gc.collect()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    # Соединения открываются пачками по concurrency, каждое получает начальные результаты
+    for first in range(0, subscribers, args.concurrency):
+        batch = clients[first:first + args.concurrency]
+        for client in batch:
+            client.start()
+        await wait_for_arrivals(first + len(batch))
+    connect_duration = time.perf_counter() - started
+    gc.collect()
+    memory_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / subscribers
+    tracemalloc.stop()
+
+    latencies = []
+    try:
+        for _ in range(args.live_rounds):
+            arrivals.clear()
+            published = time.perf_counter()
+            webapp.poll_broadcaster.publish(poll_id)
+            await wait_for_arrivals(subscribers)
+            latencies.extend(arrival - published for arrival in arrivals)
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+
+    latencies.sort()
+    errors = sum(1 for client in clients if client.status != 200)
+    result = {
+        "subscribers": subscribers,
+        "rounds": args.live_rounds,
+        "connect_duration_s": round(connect_duration, 3),
+        "memory_per_connection_kb": round(memory_per_connection / 1024, 2),
+        "coalesce_interval_ms": settings.LIVE_COALESCE_INTERVAL * 1000,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "errors": errors,
+    }
+    print(
+        f"{name:<55} subscribers={subscribers} mem/conn={result['memory_per_connection_kb']}KB "
+        f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms max={result['max_ms']}ms errors={errors}"
+    )
+    return {name: result}
+
+async def reminder_benchmark(args):
+    """Планировщик напоминаний с --reminders ожидающими напоминаниями.
+
+    Бот работает со схемой models.py, поэтому напоминания создаются во
+    временной базе SQLite, а не в базе бенчмарка. Измеряются время и
+    память загрузки кучи (tracemalloc), а затем точность пробуждения:
+    --reminders-due напоминаний добавляются после загрузки со сроками в
+    ближайшие секунды, и для каждого фиксируется опоздание отправки.
+    """
+    import gc
+    import shutil
+    import tempfile
+    import tracemalloc
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import models
+    from reminders import ReminderScheduler
+
+    name = "reminders"
+    if not scenario_selected(args, name):
+        return {}
+    directory = tempfile.mkdtemp(prefix="benchmark-reminders-")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'reminders.db')}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    users = max(REMINDER_USERS, args.reminders_due)
+    far_events = REMINDER_EVENTS
+    try:
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+            await bulk_insert(conn, models.User.__table__, [
+                {"id": n, "telegram_id": TELEGRAM_ID_BASE + n, "username": f"user{n}"} for n in range(1, users + 1)
+            ])
+            await bulk_insert(conn, models.Event.__table__, [
+                {"id": n, "title": f"Event {n}", "date": now + timedelta(days=1 + rng.random() * 30)}
+                for n in range(1, far_events + 1)
+            ])
+            reminders = (
+                {"user_id": rng.randint(1, users), "event_id": rng.randint(1, far_events),
+                 "reminder_time": rng.choice((10, 30, 60, 1440))}
+                for _ in range(args.reminders)
+            )
+            for chunk in chunked(reminders, args.chunk_size):
+                await bulk_insert(conn, models.Reminder.__table__, chunk)
+        print(f"Seeded {args.reminders} reminders in {time.perf_counter() - started:.1f}s")
+
+        sent = {}
+
+        async def send(chat_id, text):
+            sent[chat_id] = time.time()
+
+        # Память измеряется отдельной загрузкой: tracemalloc замедляет ее в разы
+        scheduler = ReminderScheduler(session_factory, send, refresh_interval=3600)
+        gc.collect()
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        await scheduler.load()
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0] - memory_before
+        tracemalloc.stop()
+
+        scheduler = ReminderScheduler(session_factory, send, refresh_interval=3600)
+        gc.collect()
+        started = time.perf_counter()
+        await scheduler.load()
+        load_duration = time.perf_counter() - started
+
+        # Каждый срочный пользователь получает одно напоминание за минуту до своего мероприятия
+        expected = {}
+        due_start = time.time() + REMINDER_DUE_LEAD
+        async with engine.begin() as conn:
+            due_events, due_reminders = [], []
+            for n in range(1, args.reminders_due + 1):
+                fire_at = due_start + REMINDER_DUE_WINDOW * n / args.reminders_due
+                expected[TELEGRAM_ID_BASE + n] = fire_at
+                event_id = far_events + n
+                due_events.append({
+                    "id": event_id, "title": f"Due {n}",
+                    "date": datetime.fromtimestamp(fire_at, timezone.utc) + timedelta(minutes=1),
+                })
+                due_reminders.append({"user_id": n, "event_id": event_id, "reminder_time": 1})
+            await bulk_insert(conn, models.Event.__table__, due_events)
+            await bulk_insert(conn, models.Reminder.__table__, due_reminders)
+
+        # Первая итерация цикла догружает новые напоминания
+        task = asyncio.create_task(scheduler.run())
+        deadline = due_start + REMINDER_DUE_WINDOW + 30
+        while len(sent) < args.reminders_due and time.time() < deadline:
+            await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    finally:
+        await engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    lateness = sorted(sent[chat_id] - fire_at for chat_id, fire_at in expected.items() if chat_id in sent)
+    result = {
+        "pending": args.reminders,
+        "load_duration_s": round(load_duration, 3),
+        "memory_mb": round(memory / 2 ** 20, 1),
+        "memory_per_reminder_bytes": round(memory / args.reminders, 1),
+        "due": args.reminders_due,
+        "sent": len(lateness),
+        "lateness_p50_ms": round(percentile(lateness, 50) * 1000, 2) if lateness else None,
+        "lateness_p99_ms": round(percentile(lateness, 99) * 1000, 2) if lateness else None,
+        "lateness_max_ms": round(lateness[-1] * 1000, 2) if lateness else None,
+    }
+    print(
+        f"{name:<55} pending={args.reminders} load={result['load_duration_s']}s mem={result['memory_mb']}MB "
+        f"lateness p50={result['lateness_p50_ms']}ms p99={result['lateness_p99_ms']}ms sent={len(lateness)}/{args.reminders_due}"
+    )
+    return {name: result}
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+async def main(args):
+    import httpx
+    import webapp
+    from database import engine
+
+    # Журнал каждого запроса клиента искажает замеры и засоряет вывод
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    await seed(webapp, args)
+
+    # ASGITransport не запускает события lifespan, вызываем их сами
+    await webapp.app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=webapp.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            counter = itertools.count()
+            scenarios = build_scenarios(args, webapp, await create_vote_poll(webapp))
+            for name, make_request in scenarios.items():
+                results[name] = await run_scenario(client, name, make_request, args, counter)
+        results.update(await bot_benchmarks(args))
+        results.update(await serialization_benchmarks(webapp, args))
+        results.update(await vote_ingest_benchmark(webapp, args))
+        results.update(await live_benchmark(webapp, args))
+        results.update(await reminder_benchmark(args))
+    finally:
+        await webapp.app.router.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.dialect.name,
+        "python": platform.python_version(),
+        "dataset": {"users": args.users, "events": args.events, "polls": args.polls, "votes": args.votes},
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        "benchmark-results",
+        f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{report['commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure_environment(arguments)
+    sys.exit(asyncio.run(main(arguments)))
@@ -1,19 +1,20 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, MenuButton, WebAppInfo, MenuButtonWebApp
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, TypeHandler
+from telegram.request import HTTPXRequest
 from config import settings
-from datetime import datetime
-from models import User, Event, Reminder, Poll
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
 from datetime import datetime, timedelta
-import asyncio
+from models import User, Event, Poll
 import os
 import jwt
-from aiogram import Bot, Dispatcher, types
-from aiogram.types import WebAppInfo
-from sqlalchemy.orm import sessionmaker
-from models import Base
+from models import Base, MessageDelivery
+from database import SessionLocal as AsyncSessionLocal, insert_ignore, init_models
+from cache import LRUSet
+from reminders import ReminderScheduler
+from gateway import SendGateway
+from sqlalchemy import insert
+import time
+import metrics
 
 # Настройка логирования
 logging.basicConfig(
@@ -28,10 +29,19 @@ logger.info(f"Database URL: {settings.DATABASE_URL}")
 logger.info(f"Webapp URL: {settings.WEBAPP_URL}")
 logger.info(f"Admin IDs: {settings.ADMIN_USER_IDS}")
 
-# Инициализация базы данных
-engine = create_engine(settings.DATABASE_URL)
-Base.metadata.create_all(bind=engine)
-SessionLocal = sessionmaker(bind=engine)
+# Пользователи, которые уже точно есть в БД
+known_users = LRUSet(settings.KNOWN_USERS_CACHE_SIZE)
+
+async def register_user(telegram_id: int):
+    """Регистрирует пользователя, повторные вызовы не обращаются к БД."""
+    if telegram_id in known_users:
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert_ignore(User, index_elements=["telegram_id"]).values(telegram_id=telegram_id)
+        )
+        await db.commit()
+    known_users.add(telegram_id)
 
 # Генерация JWT токена
 def generate_token(user_id: int) -> str:
@@ -46,21 +56,15 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.debug("Entering start handler")
     logger.info(f"Start command received from user {update.effective_user.id}")
     try:
-        db = SessionLocal()
-        # Проверяем, существует ли пользователь
-        user = db.query(User).filter(User.telegram_id == update.effective_user.id).first()
-        if not user:
-            # Создаем нового пользователя
-            user = User(telegram_id=update.effective_user.id)
-            db.add(user)
-            db.commit()
+        # Создаем пользователя, если его еще нет
+        await register_user(update.effective_user.id)
         
         # Создаем кнопку для открытия веб-приложения
-        webapp_button = types.InlineKeyboardButton(
+        webapp_button = InlineKeyboardButton(
             text="Открыть приложение",
             web_app=WebAppInfo(url=f"{settings.WEBAPP_URL}?token={generate_token(update.effective_user.id)}")
         )
-        keyboard = types.InlineKeyboardMarkup().add(webapp_button)
+        keyboard = InlineKeyboardMarkup([[webapp_button]])
         
         await update.message.reply_text(
             "Добро пожаловать в бот для управления мероприятиями и опросами! ��\n\n"
@@ -111,30 +115,157 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error in button handler: {str(e)}")
         raise
 
-async def check_reminders():
-    """Проверка и отправка напоминаний"""
-    logger.debug("Checking reminders")
-    with Session(engine) as session:
-        current_time = datetime.utcnow()
-        reminders = session.query(Reminder).filter(
-            Reminder.remind_at <= current_time,
-            Reminder.sent == False
-        ).all()
-        
-        for reminder in reminders:
-            logger.debug(f"Processing reminder {reminder.id}")
-            reminder.sent = True
-            session.commit()
+async def record_deliveries(results: list):
+    """Сохраняет результаты доставки сообщений одним INSERT."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(MessageDelivery), results)
+        await db.commit()
+
+def acquire_leader_lock(path: str):
+    """Пытается захватить файловую блокировку без ожидания.
+
+    Возвращает открытый файл, пока он открыт, блокировка удерживается.
+    None - блокировку держит другой процесс. Так при нескольких воркерах
+    uvicorn в режиме webhook напоминания рассылает только один из них.
+    Блокировка действует в пределах хоста.
+    """
+    lock_file = open(path, "a")
+    try:
+        import fcntl
+    except ImportError:
+        # На Windows блокировка не поддерживается, считаем процесс единственным
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+async def post_init(application: Application):
+    """Запускает шлюз отправки, планировщик напоминаний и сервер метрик вместе с ботом."""
+    # Инициализация базы данных
+    await init_models(Base.metadata)
+
+    async def send_message(chat_id: int, text: str):
+        await application.bot.send_message(chat_id=chat_id, text=text)
+
+    gateway = SendGateway(
+        send_message,
+        record=record_deliveries,
+        global_rate=settings.SEND_GLOBAL_RATE,
+        per_chat_rate=settings.SEND_PER_CHAT_RATE,
+        max_concurrency=settings.SEND_MAX_CONCURRENCY
+    )
+    gateway.start()
+    application.bot_data["send_gateway"] = gateway
+
+    leader_lock = acquire_leader_lock(settings.BOT_LOCK_FILE)
+    if leader_lock is None:
+        logger.info("Reminders are handled by another bot process, scheduler not started")
+    else:
+        application.bot_data["leader_lock"] = leader_lock
+        scheduler = ReminderScheduler(
+            AsyncSessionLocal,
+            gateway.send,
+            refresh_interval=settings.REMINDER_REFRESH_INTERVAL,
+            retry_delay=settings.REMINDER_RETRY_DELAY,
+            max_retry_delay=settings.REMINDER_RETRY_MAX_DELAY
+        )
+        await scheduler.start()
+        application.bot_data["reminder_scheduler"] = scheduler
+
+    # В режиме webhook метрики бота отдает /metrics веб-приложения
+    if settings.BOT_MODE != "webhook" and settings.BOT_METRICS_PORT:
+        application.bot_data["metrics_server"] = await metrics.start_http_server(settings.BOT_METRICS_PORT)
+        logger.info(f"Bot metrics available on port {settings.BOT_METRICS_PORT}")
+
+async def post_shutdown(application: Application):
+    """Останавливает планировщик напоминаний, сбрасывает результаты доставки и закрывает сервер метрик."""
+    scheduler = application.bot_data.get("reminder_scheduler")
+    if scheduler:
+        await scheduler.stop()
+    gateway = application.bot_data.get("send_gateway")
+    if gateway:
+        await gateway.stop()
+    metrics_server = application.bot_data.get("metrics_server")
+    if metrics_server:
+        await metrics_server.cleanup()
+    leader_lock = application.bot_data.pop("leader_lock", None)
+    if leader_lock:
+        leader_lock.close()
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTP-клиент Bot API, замеряющий задержку каждого вызова."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            # Последний сегмент URL - имя метода API (sendMessage, getUpdates, ...)
+            metrics.TELEGRAM_API_DURATION.observe(
+                time.perf_counter() - start_time, url.rsplit("/", 1)[-1]
+            )
+
+async def count_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Учитывает входящее обновление по его типу."""
+    kind = next((name for name in Update.ALL_TYPES if getattr(update, name, None) is not None), "unknown")
+    metrics.BOT_UPDATES.inc(kind)
+
+def build_application() -> Application:
+    """Создает приложение бота со всеми обработчиками."""
+    application = (
+        Application.builder()
+        .token(settings.BOT_TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    # Добавляем обработчики
+    application.add_handler(TypeHandler(Update, count_update), group=-1)
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CallbackQueryHandler(button_handler))
+    return application
+
+async def start_webhook(application: Application):
+    """Запускает бота в режиме webhook в уже работающем event loop.
+
+    Обновления принимает веб-приложение и передает в process_webhook_update.
+    """
+    if not settings.WEBHOOK_URL or not settings.WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode")
+    
+    await application.initialize()
+    await application.post_init(application)
+    # Регистрирует webhook только один воркер, остальные лишь принимают обновления
+    if "leader_lock" in application.bot_data:
+        await application.bot.set_webhook(
+            url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    await application.start()
+    logger.info("Bot started in webhook mode")
+
+async def stop_webhook(application: Application):
+    """Останавливает бота, запущенного через start_webhook."""
+    await application.stop()
+    await application.post_shutdown(application)
+    await application.shutdown()
+
+async def process_webhook_update(application: Application, data: dict):
+    """Ставит обновление от Telegram в очередь обработки бота."""
+    update = Update.de_json(data, application.bot)
+    await application.update_queue.put(update)
 
 def main():
     """Запуск бота"""
     logger.info("Initializing bot application...")
     try:
-        application = Application.builder().token(settings.BOT_TOKEN).build()
-        
-        # Добавляем обработчики
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CallbackQueryHandler(button_handler))
+        application = build_application()
         
         logger.info("Starting bot polling...")
         # Запускаем бота
@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class Snapshot:
+    """Значение в памяти процесса с коротким временем жизни.
+
+    Сбрасывается по истечении ttl или явным вызовом invalidate().
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._value: Any = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[Any]:
+        """Возвращает сохраненное значение или None, если оно устарело."""
+        if time.monotonic() >= self._expires_at:
+            return None
+        return self._value
+
+    def set(self, value: Any):
+        self._value = value
+        self._expires_at = time.monotonic() + self._ttl
+
+    def invalidate(self):
+        self._value = None
+        self._expires_at = 0.0
+
+class LRUSet:
+    """Множество ограниченного размера, вытесняет давно не использованные ключи."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._items: "OrderedDict[Any, None]" = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        if key in self._items:
+            self._items.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, key):
+        self._items[key] = None
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+class ExpiringSet:
+    """Множество ключей, каждый из которых действует ttl секунд после добавления."""
+
+    def __init__(self, ttl: float, max_size: int = 100000):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._items: "OrderedDict[Any, float]" = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        expires_at = self._items.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return False
+        return True
+
+    def add(self, key):
+        self._items[key] = time.monotonic() + self._ttl
+        self._items.move_to_end(key)
+        # Ключи упорядочены по времени добавления, самые старые - в начале
+        while self._items and (
+            len(self._items) > self._max_size or next(iter(self._items.values())) <= time.monotonic()
+        ):
+            self._items.popitem(last=False)
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из файла .env
@@ -10,8 +11,95 @@ class Settings(BaseModel):
     BOT_TOKEN: str = os.getenv("BOT_TOKEN")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./events.db")
     WEBAPP_URL: str = os.getenv("WEBAPP_URL", "http://localhost:8000/webapp")
+    JWT_SECRET: str = os.getenv("JWT_SECRET", "")
     ADMIN_USER_IDS: List[int] = [int(id.strip()) for id in os.getenv("ADMIN_USER_IDS", "").split(",") if id.strip()]
 
+    # Реплики для чтения (через запятую) и проверка их доступности
+    DATABASE_REPLICA_URLS: List[str] = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    REPLICA_HEALTH_CHECK_INTERVAL: float = float(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "10"))
+    # Сколько секунд после записи пользователь читает с основной БД
+    READ_YOUR_WRITES_WINDOW: float = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+    # Пул соединений с базой данных
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+    # Период сброса буфера активности пользователей, в секундах
+    ACTIVITY_FLUSH_INTERVAL: float = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+
+    # Проверка initData Telegram Web App
+    TELEGRAM_AUTH_MAX_AGE: int = int(os.getenv("TELEGRAM_AUTH_MAX_AGE", "86400"))
+    TELEGRAM_AUTH_CACHE_SIZE: int = int(os.getenv("TELEGRAM_AUTH_CACHE_SIZE", "10000"))
+
+    # Время жизни снимка статистики админ-панели, в секундах
+    STATS_CACHE_TTL: float = float(os.getenv("STATS_CACHE_TTL", "30"))
+
+    # Конфигурация полнотекстового поиска Postgres
+    SEARCH_LANGUAGE: str = os.getenv("SEARCH_LANGUAGE", "russian")
+
+    # Интервал, после которого ETag списков меняется даже без записей, в секундах
+    ETAG_TIME_BUCKET: int = int(os.getenv("ETAG_TIME_BUCKET", "60"))
+
+    # Лимиты исходящих сообщений Telegram
+    SEND_GLOBAL_RATE: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    SEND_PER_CHAT_RATE: float = float(os.getenv("SEND_PER_CHAT_RATE", "1"))
+    SEND_MAX_CONCURRENCY: int = int(os.getenv("SEND_MAX_CONCURRENCY", "10"))
+
+    # Как часто планировщик догружает новые напоминания, секунды
+    REMINDER_REFRESH_INTERVAL: float = float(os.getenv("REMINDER_REFRESH_INTERVAL", "60"))
+    # Повтор неудачной отправки напоминания: задержка удваивается до максимума
+    REMINDER_RETRY_DELAY: float = float(os.getenv("REMINDER_RETRY_DELAY", "30"))
+    REMINDER_RETRY_MAX_DELAY: float = float(os.getenv("REMINDER_RETRY_MAX_DELAY", "900"))
+
+    # Сколько уже зарегистрированных пользователей бот помнит в памяти
+    KNOWN_USERS_CACHE_SIZE: int = int(os.getenv("KNOWN_USERS_CACHE_SIZE", "100000"))
+
+    # Режим работы бота: polling (отдельный процесс bot.py) или webhook (внутри webapp)
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    # Файл блокировки: напоминания рассылает только один процесс бота на хосте
+    BOT_LOCK_FILE: str = os.getenv("BOT_LOCK_FILE", os.path.join(tempfile.gettempdir(), "g-event-bot.lock"))
+    # Порт /metrics процесса бота в режиме polling (0 - не запускать)
+    BOT_METRICS_PORT: int = int(os.getenv("BOT_METRICS_PORT", "9101"))
+
+    # Размер пачки при массовом импорте мероприятий
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+    # Сколько строк читать из БД за раз при выгрузке
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Результаты опросов в реальном времени: интервал объединения и keep-alive, в секундах
+    LIVE_COALESCE_INTERVAL: float = float(os.getenv("LIVE_COALESCE_INTERVAL", "0.25"))
+    LIVE_KEEPALIVE_INTERVAL: float = float(os.getenv("LIVE_KEEPALIVE_INTERVAL", "15"))
+
+    # Пакетная запись голосов: размер пачки и время ожидания ее наполнения, в секундах
+    VOTE_BATCH_SIZE: int = int(os.getenv("VOTE_BATCH_SIZE", "500"))
+    VOTE_BATCH_DELAY: float = float(os.getenv("VOTE_BATCH_DELAY", "0.01"))
+
+    # Ограничение частоты запросов: бюджеты вида "запросов/секунд" и хранилище счетчиков
+    RATE_LIMIT_STORAGE_URL: str = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+    RATE_LIMIT_AUTH: str = os.getenv("RATE_LIMIT_AUTH", "10/60")
+    RATE_LIMIT_VOTE: str = os.getenv("RATE_LIMIT_VOTE", "30/60")
+    RATE_LIMIT_EVENTS: str = os.getenv("RATE_LIMIT_EVENTS", "20/60")
+
+    # Период обновления списка администраторов из БД, в секундах
+    ADMIN_CACHE_TTL: float = float(os.getenv("ADMIN_CACHE_TTL", "60"))
+
+    # SQLite: WAL, pragmas на каждом соединении и отдельное соединение для записи
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_SINGLE_WRITER: bool = os.getenv("SQLITE_SINGLE_WRITER", "true").lower() in ("1", "true", "yes")
+
+    # Профилирование SQL (для разработки и staging): журнал медленных запросов и поиск N+1
+    SQL_PROFILE: bool = os.getenv("SQL_PROFILE", "").lower() in ("1", "true", "yes")
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
     class Config:
         env_file = ".env"
 
@@ -22,4 +110,11 @@ class Settings(BaseModel):
         # Для PostgreSQL добавляем параметры
         DATABASE_URL = DATABASE_URL + "?sslmode=require"
 
+    # Реплики подключаются с теми же параметрами SSL, что и основная БД
+    DATABASE_REPLICA_URLS = [
+        url if url.startswith("sqlite") or "sslmode=" in url
+        else url + ("&" if "?" in url else "?") + "sslmode=require"
+        for url in DATABASE_REPLICA_URLS
+    ]
+
 settings = Settings() 
\ No newline at end of file
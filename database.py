@@ -0,0 +1,182 @@
+from sqlalchemy import event, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import UpdateBase
+from config import settings
+from metrics import instrument_engine
+from profiling import enable_profiling
+from replicas import ReplicaSet
+
+# Асинхронные драйверы для поддерживаемых СУБД
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def make_async_url(database_url: str):
+    """Переводит DATABASE_URL на асинхронный драйвер.
+
+    Возвращает URL и connect_args для create_async_engine.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    connect_args = {}
+
+    if backend in ("postgres", "postgresql"):
+        # asyncpg не понимает sslmode в строке подключения
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode
+        url = url.set(query=query)
+
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    return url, connect_args
+
+def create_engine_from_url(database_url: str, **overrides):
+    """Создает асинхронный движок с ограниченным пулом соединений."""
+    url, connect_args = make_async_url(database_url)
+    kwargs = {"connect_args": connect_args, "pool_pre_ping": True}
+
+    # In-memory SQLite работает через StaticPool без настроек пула. Для
+    # файловой SQLite aiosqlite по умолчанию берет NullPool, который не
+    # принимает размеры пула, поэтому класс пула задается явно
+    if url.database not in (None, "", ":memory:"):
+        kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    kwargs.update(overrides)
+    return create_async_engine(url, **kwargs)
+
+def is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def apply_sqlite_pragmas(sync_engine):
+    """Настраивает каждое новое соединение SQLite.
+
+    WAL позволяет читать параллельно с записью, busy_timeout ждет
+    блокировку вместо немедленной ошибки "database is locked".
+    """
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def use_immediate_transactions(sync_engine):
+    """Транзакции записи начинаются с BEGIN IMMEDIATE.
+
+    Блокировка на запись берется сразу, поэтому транзакция не упадет
+    при попытке повысить блокировку с чтения до записи, а ожидание
+    другого процесса покрывается busy_timeout.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+engine = create_engine_from_url(settings.DATABASE_URL)
+write_engine = engine
+
+if is_sqlite_file(settings.DATABASE_URL):
+    apply_sqlite_pragmas(engine.sync_engine)
+    if settings.SQLITE_SINGLE_WRITER:
+        # Все записи идут через одно соединение, остальные ждут его в очереди пула
+        write_engine = create_engine_from_url(
+            settings.DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+        )
+        apply_sqlite_pragmas(write_engine.sync_engine)
+        use_immediate_transactions(write_engine.sync_engine)
+
+# Реплики для чтения, если заданы DATABASE_REPLICA_URLS
+replica_engines = [create_engine_from_url(url) for url in settings.DATABASE_REPLICA_URLS]
+replica_set = ReplicaSet(replica_engines, check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL)
+
+for sync_engine in {e.sync_engine for e in (engine, write_engine, *replica_engines)}:
+    # Учет количества и времени запросов для /metrics
+    instrument_engine(sync_engine)
+    if settings.SQL_PROFILE:
+        enable_profiling(sync_engine, settings.SLOW_QUERY_THRESHOLD_MS)
+
+class RoutingSession(Session):
+    """Сессия, отправляющая запись на write_engine, а чтение на engine.
+
+    После первой записи сессия остается на write_engine до конца, чтобы
+    последующие чтения видели ее собственные незакоммиченные изменения.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.bind is not None:
+            # Сессия явно привязана к движку (например, к реплике)
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self.info.get("writer") or self._flushing or isinstance(clause, UpdateBase):
+            self.info["writer"] = True
+            return write_engine.sync_engine
+        return engine.sync_engine
+
+if write_engine is engine:
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+else:
+    SessionLocal = async_sessionmaker(
+        class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+    )
+
+def read_session(primary: bool = False) -> AsyncSession:
+    """Сессия для запросов только на чтение.
+
+    Использует доступную реплику, если они настроены и primary не задан,
+    иначе основную БД.
+    """
+    replica = None if primary else replica_set.choose()
+    if replica is None:
+        return SessionLocal()
+    return SessionLocal(bind=replica)
+
+def insert_ignore(model, index_elements):
+    """INSERT ... ON CONFLICT DO NOTHING для текущей СУБД."""
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(model).prefix_with("IGNORE")
+
+async def get_db():
+    """Зависимость FastAPI: асинхронная сессия БД на время запроса."""
+    async with SessionLocal() as db:
+        yield db
+
+async def init_models(metadata):
+    """Создает таблицы, если их еще нет."""
+    async with write_engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+async def dispose_engine():
+    """Закрывает все соединения пулов."""
+    await engine.dispose()
+    await replica_set.dispose()
+    if write_engine is not engine:
+        await write_engine.dispose()
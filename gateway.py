@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Ведро токенов: не более rate операций в секунду с запасом capacity."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self) -> bool:
+        """Ведро полное, его можно удалить без потери ограничения."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Достает retry_after из ошибки 429 (python-telegram-bot или aiogram)."""
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return retry_after
+
+class SendGateway:
+    """Шлюз исходящих сообщений с ограничением скорости.
+
+    Соблюдает общий лимит Telegram (около 30 сообщений в секунду) и лимит
+    на один чат (около 1 в секунду), ограничивает число одновременных
+    запросов и повторяет отправку после ответа 429 с retry_after.
+    Результаты доставки передаются в record пачками.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int, str], Awaitable[None]],
+        record: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+        global_rate: float = 30,
+        per_chat_rate: float = 1,
+        max_concurrency: int = 10,
+        max_retries: int = 3,
+        flush_interval: float = 2.0,
+        max_chat_buckets: int = 10000
+    ):
+        self._send = send
+        self._record = record
+        self._global = TokenBucket(global_rate, capacity=global_rate)
+        self._per_chat_rate = per_chat_rate
+        self._chats: Dict[int, TokenBucket] = {}
+        self._max_chat_buckets = max_chat_buckets
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_retries = max_retries
+        self._paused_until = 0.0
+        self._flush_interval = flush_interval
+        self._results: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self._max_chat_buckets:
+                # Убираем полные ведра, они больше ничего не ограничивают
+                for idle_chat in [c for c, b in self._chats.items() if b.is_idle()]:
+                    del self._chats[idle_chat]
+            bucket = self._chats[chat_id] = TokenBucket(self._per_chat_rate)
+        return bucket
+
+    async def _wait_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _add_result(self, chat_id: int, status: str, error: Optional[str] = None):
+        if self._record is not None:
+            self._results.append({
+                "chat_id": chat_id, "status": status, "error": error,
+                "created_at": datetime.now(timezone.utc)
+            })
+
+    async def send(self, chat_id: int, text: str) -> bool:
+        """Отправляет сообщение с учетом лимитов. Возвращает True при успехе."""
+        error = None
+        for attempt in range(self._max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._wait_pause()
+            await self._global.acquire()
+            try:
+                async with self._semaphore:
+                    await self._send(chat_id, text)
+                self._add_result(chat_id, "sent")
+                return True
+            except Exception as e:
+                error = e
+                retry_after = retry_after_seconds(e)
+                if retry_after is None:
+                    break
+                # 429 обычно означает общий лимит, приостанавливаем все отправки
+                logger.warning(f"Flood limit hit, retrying in {retry_after}s")
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+        logger.error(f"Error sending message to {chat_id}: {error}")
+        self._add_result(chat_id, "failed", str(error))
+        return False
+
+    async def flush(self):
+        """Передает накопленные результаты доставки в record."""
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        try:
+            await self._record(results)
+        except Exception as e:
+            logger.error(f"Error recording delivery results: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
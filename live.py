@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """Подписка одного клиента на результаты нескольких опросов.
+
+    Для каждого опроса хранится только последнее неотправленное
+    сообщение, поэтому медленный клиент получает последнее состояние.
+    """
+
+    def __init__(self, poll_ids: Iterable[int]):
+        self.poll_ids = set(poll_ids)
+        self._pending: Dict[int, str] = {}
+        self._ready = asyncio.Event()
+
+    def put(self, poll_id: int, message: str):
+        self._pending[poll_id] = message
+        self._ready.set()
+
+    async def get(self) -> List[str]:
+        """Ждет и забирает накопившиеся сообщения."""
+        await self._ready.wait()
+        self._ready.clear()
+        messages = list(self._pending.values())
+        self._pending.clear()
+        return messages
+
+class PollBroadcaster:
+    """Рассылка результатов опросов подписчикам (Server-Sent Events).
+
+    Изменения одного опроса объединяются: результаты загружаются и
+    рассылаются не чаще одного раза за interval секунд. Один клиент
+    получает все свои опросы через одну подписку (одно соединение).
+    Подписки хранятся в памяти процесса: изменения из других воркеров
+    сюда не попадают.
+    """
+
+    def __init__(self, load: Callable[[int], Awaitable[dict]], interval: float = 0.25):
+        self._load = load
+        self._interval = interval
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._scheduled: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, poll_ids: Iterable[int]) -> Subscription:
+        subscription = Subscription(poll_ids)
+        for poll_id in subscription.poll_ids:
+            self._subscribers.setdefault(poll_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for poll_id in subscription.poll_ids:
+            subscribers = self._subscribers.get(poll_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[poll_id]
+
+    def publish(self, poll_id: int):
+        """Отмечает, что результаты опроса изменились."""
+        if poll_id not in self._subscribers or poll_id in self._scheduled:
+            return
+        self._scheduled.add(poll_id)
+        asyncio.get_running_loop().call_later(self._interval, self._start_broadcast, poll_id)
+
+    def _start_broadcast(self, poll_id: int):
+        # Храним ссылку на задачу, иначе ее может собрать сборщик мусора
+        task = asyncio.create_task(self._broadcast(poll_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _broadcast(self, poll_id: int):
+        self._scheduled.discard(poll_id)
+        subscribers = self._subscribers.get(poll_id)
+        if not subscribers:
+            return
+        try:
+            message = self.format(await self._load(poll_id))
+        except Exception as e:
+            logger.error(f"Error loading results for poll {poll_id}: {e}")
+            return
+        for subscription in list(subscribers):
+            subscription.put(poll_id, message)
+
+    @staticmethod
+    def format(data: dict) -> str:
+        """Форматирует событие SSE."""
+        return f"event: results\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
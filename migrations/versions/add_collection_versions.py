@@ -0,0 +1,27 @@
+"""Add collection_versions table
+
+Revision ID: add_collection_versions
+Revises: add_events_search
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_collection_versions'
+down_revision = 'add_events_search'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Версии списков для ETag: увеличиваются в транзакции каждой записи
+    collection_versions = op.create_table(
+        'collection_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(collection_versions, [{'name': 'events', 'version': 0}, {'name': 'polls', 'version': 0}])
+
+def downgrade():
+    op.drop_table('collection_versions')
@@ -0,0 +1,22 @@
+"""Add date and (category, date) indexes to events
+
+Revision ID: add_events_date_indexes
+Revises: add_users_last_active_index
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = 'add_events_date_indexes'
+down_revision = 'add_users_last_active_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Индексы для выборок по дате и категории
+    op.create_index('ix_events_date', 'events', ['date'])
+    op.create_index('ix_events_category_date', 'events', ['category', 'date'])
+
+def downgrade():
+    op.drop_index('ix_events_category_date', table_name='events')
+    op.drop_index('ix_events_date', table_name='events')
@@ -0,0 +1,23 @@
+"""Add full-text search index on events
+
+Revision ID: add_events_search
+Revises: add_votes_poll_user_unique
+Create Date: 2026-10-18
+"""
+import os
+from alembic import op
+from search import create_search_index, drop_search_index
+
+# revision identifiers, used by Alembic
+revision = 'add_events_search'
+down_revision = 'add_votes_poll_user_unique'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # FTS5 с триггерами для SQLite, вычисляемая колонка tsvector с GIN-индексом для Postgres.
+    # Язык должен совпадать с SEARCH_LANGUAGE приложения
+    create_search_index(op.get_bind(), os.getenv("SEARCH_LANGUAGE", "russian"))
+
+def downgrade():
+    drop_search_index(op.get_bind())
@@ -0,0 +1,29 @@
+"""Add message_deliveries table
+
+Revision ID: add_message_deliveries
+Revises: add_reminders_sent_at
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_message_deliveries'
+down_revision = 'add_reminders_sent_at'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Журнал доставки исходящих сообщений
+    op.create_table(
+        'message_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('error', sa.String()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+def downgrade():
+    op.drop_table('message_deliveries')
@@ -0,0 +1,30 @@
+"""Add votes_count counter to poll_options
+
+Revision ID: add_poll_option_votes_count
+Revises: add_polls
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_poll_option_votes_count'
+down_revision = 'add_polls'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Добавляем счетчик голосов
+    op.add_column(
+        'poll_options',
+        sa.Column('votes_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Заполняем счетчик по уже существующим голосам
+    op.execute(
+        "UPDATE poll_options SET votes_count = "
+        "(SELECT COUNT(*) FROM votes WHERE votes.option_id = poll_options.id)"
+    )
+
+def downgrade():
+    op.drop_column('poll_options', 'votes_count')
@@ -0,0 +1,28 @@
+"""Add sent_at to reminders
+
+Revision ID: add_reminders_sent_at
+Revises: add_events_date_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_reminders_sent_at'
+down_revision = 'add_events_date_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('reminders', sa.Column('sent_at', sa.DateTime(timezone=True)))
+
+    # Частичный индекс по неотправленным напоминаниям
+    op.create_index(
+        'ix_reminders_pending', 'reminders', ['event_id'],
+        postgresql_where=sa.text('sent_at IS NULL'),
+        sqlite_where=sa.text('sent_at IS NULL')
+    )
+
+def downgrade():
+    op.drop_index('ix_reminders_pending', table_name='reminders')
+    op.drop_column('reminders', 'sent_at')
@@ -0,0 +1,20 @@
+"""Add keyset index on users (last_active, id)
+
+Revision ID: add_users_last_active_index
+Revises: add_poll_option_votes_count
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = 'add_users_last_active_index'
+down_revision = 'add_poll_option_votes_count'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Индекс для постраничного вывода пользователей
+    op.create_index('ix_users_last_active_id', 'users', ['last_active', 'id'])
+
+def downgrade():
+    op.drop_index('ix_users_last_active_id', table_name='users')
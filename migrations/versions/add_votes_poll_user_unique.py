@@ -0,0 +1,57 @@
+"""Add votes.poll_id and unique (poll_id, user_id) for batched vote ingestion
+
+Revision ID: add_votes_poll_user_unique
+Revises: add_message_deliveries
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_votes_poll_user_unique'
+down_revision = 'add_message_deliveries'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Базы, созданные через create_all старой модели, не имеют poll_id и ограничения
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('votes')}
+    indexes = {index['name'] for index in inspector.get_indexes('votes')}
+    constraints = {constraint['name'] for constraint in inspector.get_unique_constraints('votes')}
+
+    if 'poll_id' not in columns:
+        op.add_column('votes', sa.Column('poll_id', sa.Integer(), nullable=True))
+    if 'ix_votes_poll_id' not in indexes:
+        op.create_index('ix_votes_poll_id', 'votes', ['poll_id'])
+
+    # poll_id берем из варианта, за который отдан голос
+    op.execute("""
+        UPDATE votes SET poll_id = (
+            SELECT poll_options.poll_id FROM poll_options WHERE poll_options.id = votes.option_id
+        )
+        WHERE poll_id IS NULL
+    """)
+
+    # Повторные голоса пользователя в опросе: оставляем самый ранний
+    op.execute("""
+        DELETE FROM votes WHERE id NOT IN (
+            SELECT MIN(id) FROM votes GROUP BY poll_id, user_id
+        )
+    """)
+
+    # Счетчики могли учитывать удаленные дубликаты
+    op.execute("""
+        UPDATE poll_options SET votes_count = (
+            SELECT COUNT(*) FROM votes WHERE votes.option_id = poll_options.id
+        )
+    """)
+
+    if 'uq_votes_poll_user' not in indexes | constraints:
+        op.create_index('uq_votes_poll_user', 'votes', ['poll_id', 'user_id'], unique=True)
+
+def downgrade():
+    # Колонку poll_id и ограничение из исходной схемы initial не трогаем
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('votes')}
+    if 'uq_votes_poll_user' in indexes:
+        op.drop_index('uq_votes_poll_user', table_name='votes')
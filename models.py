@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Table, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Boolean, ForeignKey, Table, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -58,10 +58,20 @@ class Reminder(Base):
     event_id = Column(Integer, ForeignKey('events.id'))
     reminder_time = Column(Integer)  # время в минутах до начала мероприятия
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime(timezone=True))  # NULL, пока напоминание не отправлено
     
     user = relationship("User", back_populates="reminders")
     event = relationship("Event", back_populates="reminders")
 
+    __table_args__ = (
+        # Частичный индекс для загрузки неотправленных напоминаний
+        Index(
+            'ix_reminders_pending', 'event_id',
+            postgresql_where=sent_at.is_(None),
+            sqlite_where=sent_at.is_(None)
+        ),
+    )
+
 class Poll(Base):
     __tablename__ = 'polls'
 
@@ -94,4 +104,21 @@ class Vote(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
     user = relationship("User", back_populates="votes")
-    option = relationship("PollOption", back_populates="votes") 
\ No newline at end of file
+    option = relationship("PollOption", back_populates="votes")
+
+class MessageDelivery(Base):
+    __tablename__ = 'message_deliveries'
+
+    id = Column(Integer, primary_key=True)
+    # id чатов Telegram не помещаются в 32 бита
+    chat_id = Column(BigInteger, nullable=False)
+    status = Column(String, nullable=False)  # sent, failed
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class CollectionVersion(Base):
+    __tablename__ = 'collection_versions'
+
+    # Версия списка (events, polls) для ETag, общая для всех процессов
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,100 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Списки значений IN (...) разной длины и номера параметров не меняют форму запроса
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:\?|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|:\w+))*\s*\)")
+_PLACEHOLDER_RE = re.compile(r"\$\d+|%s|:\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Нормализует SQL до формы без конкретных параметров."""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _PLACEHOLDER_LIST_RE.sub("(?)", shape)
+    return _PLACEHOLDER_RE.sub("?", shape)
+
+class RequestProfile:
+    """Запросы к БД, выполненные в рамках одного HTTP-запроса."""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, duration: float):
+        self.statements.append((statement, duration))
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """Формы запросов, повторенные не менее threshold раз (подозрение на N+1)."""
+        shapes = Counter(statement_shape(statement) for statement, _ in self.statements)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+    def summary(self, threshold: int) -> str:
+        """Краткая сводка для заголовка X-SQL-Profile."""
+        return (
+            f"queries={len(self.statements)}; "
+            f"time={self.total_time * 1000:.1f}ms; "
+            f"n_plus_one={len(self.repeated_shapes(threshold))}"
+        )
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+def explain(conn, statement: str, parameters, executemany: bool) -> Optional[str]:
+    """Получает план запроса отдельным курсором, минуя события SQLAlchemy."""
+    if conn.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(value) for value in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+def enable_profiling(engine, slow_threshold_ms: float = 100):
+    """Подключает профилирование SQL к движку.
+
+    Каждый запрос записывается в профиль текущего HTTP-запроса, запросы
+    дольше slow_threshold_ms пишутся в лог вместе с планом выполнения.
+    """
+    from sqlalchemy import event
+
+    slow_threshold = slow_threshold_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["profile_start_time"].pop()
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, duration)
+
+        if duration >= slow_threshold:
+            try:
+                plan = explain(conn, statement, parameters, executemany)
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+            logger.warning(
+                f"Slow query ({duration * 1000:.1f}ms): {statement}\n"
+                f"Parameters: {parameters!r}\nPlan:\n{plan}"
+            )
+
+def report(profile: RequestProfile, method: str, path: str, threshold: int):
+    """Пишет в лог подозрения на N+1 для завершенного запроса."""
+    for shape, count in profile.repeated_shapes(threshold):
+        logger.warning(f"Possible N+1 in {method} {path}: {count} x {shape}")
@@ -0,0 +1,117 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+class MemoryRateLimitStore:
+    """Счетчики в памяти процесса.
+
+    Для каждого ключа хранятся только номер текущего окна и два счетчика:
+    текущего и предыдущего окна. Число ключей ограничено max_keys: сначала
+    удаляются устаревшие ключи, затем давно не использованные.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self._max_keys = max_keys
+        self._counters: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._counters)
+
+    async def increment(self, key: str, window_index: int, window: int) -> Tuple[int, int]:
+        """Увеличивает счетчик окна и возвращает (текущее, предыдущее)."""
+        entry = self._counters.get(key)
+        if entry is None:
+            if len(self._counters) >= self._max_keys:
+                self._evict(window_index)
+            entry = self._counters[key] = [window_index, 0, 0]
+        else:
+            self._counters.move_to_end(key)
+            if entry[0] != window_index:
+                previous = entry[1] if entry[0] == window_index - 1 else 0
+                entry[:] = [window_index, 0, previous]
+        entry[1] += 1
+        return entry[1], entry[2]
+
+    def _evict(self, window_index: int):
+        # Ключи старше предыдущего окна ни на что не влияют
+        for key in [k for k, v in self._counters.items() if v[0] < window_index - 1]:
+            del self._counters[key]
+        # Если активных ключей все равно слишком много, вытесняем самые старые
+        while len(self._counters) >= self._max_keys:
+            self._counters.popitem(last=False)
+
+class RedisRateLimitStore:
+    """Счетчики в Redis, общие для нескольких воркеров uvicorn.
+
+    Требует пакет redis (pip install redis).
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("Redis rate limit storage requires the 'redis' package")
+        self._redis = redis.from_url(url)
+
+    async def increment(self, key: str, window_index: int, window: int) -> Tuple[int, int]:
+        current_key = f"ratelimit:{key}:{window_index}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, window * 2)
+            pipe.get(f"ratelimit:{key}:{window_index - 1}")
+            current, _, previous = await pipe.execute()
+        return int(current), int(previous or 0)
+
+def create_store(url: str):
+    """Создает хранилище счетчиков по URL: memory:// или redis://..."""
+    if url.startswith("redis"):
+        return RedisRateLimitStore(url)
+    return MemoryRateLimitStore()
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Разбирает бюджет вида "30/60" (запросов / секунд)."""
+    limit, window = value.split("/")
+    return int(limit), int(window)
+
+class RateLimiter:
+    """Ограничение частоты запросов скользящим окном.
+
+    Используется приближение скользящего окна по двум соседним
+    фиксированным окнам: предыдущее окно учитывается с весом, равным
+    доле, которая еще попадает в скользящее окно.
+    """
+
+    def __init__(self, store, rules: List[Tuple[str, str, str]]):
+        self._store = store
+        self._rules = [
+            (method, re.compile(pattern), *parse_limit(budget))
+            for method, pattern, budget in rules
+        ]
+
+    def match(self, method: str, path: str) -> Optional[Tuple[str, int, int]]:
+        """Находит правило для запроса: (имя правила, лимит, окно)."""
+        for rule_method, pattern, limit, window in self._rules:
+            if rule_method == method and pattern.match(path):
+                return pattern.pattern, limit, window
+        return None
+
+    async def hit(self, rule: str, identity: str, limit: int, window: int) -> Optional[int]:
+        """Учитывает запрос. Возвращает Retry-After в секундах, если лимит превышен."""
+        now = time.time()
+        window_index = int(now // window)
+        elapsed = now - window_index * window
+        current, previous = await self._store.increment(f"{rule}:{identity}", window_index, window)
+
+        weight = 1 - elapsed / window
+        if previous * weight + current <= limit:
+            return None
+
+        if current > limit or previous == 0:
+            # Освободится только в следующем окне
+            retry_after = window - elapsed
+        else:
+            # Ждем, пока вес предыдущего окна уменьшится достаточно
+            retry_after = window * (1 - (limit - current) / previous) - elapsed
+        return max(1, math.ceil(retry_after))
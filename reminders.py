@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+from sqlalchemy import func, select, update
+from models import Reminder, Event, User
+
+logger = logging.getLogger(__name__)
+
+def as_utc(value: datetime) -> datetime:
+    """SQLite возвращает даты без часового пояса, считаем их UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class ReminderScheduler:
+    """Планировщик напоминаний на min-куче.
+
+    При запуске загружает неотправленные напоминания о будущих
+    мероприятиях и спит до ближайшего срока вместо опроса таблицы.
+    В куче хранятся только пары (время срабатывания, id напоминания),
+    остальные данные подгружаются пачкой в момент отправки.
+
+    Напоминания создаются вне процесса бота, поэтому раз в
+    refresh_interval секунд догружаются записи с id больше последнего
+    известного. Там же перечитываются напоминания о мероприятиях,
+    которые теперь начинаются раньше следующей проверки: перенос на
+    более раннее время сдвигает срок. Перенос на более позднее время
+    или удаление мероприятия проверяется при срабатывании.
+
+    Текущий срок каждого напоминания хранится в словаре, записи кучи с
+    другим сроком считаются устаревшими и пропускаются. Неудачная
+    отправка повторяется с экспоненциальной задержкой, пока повтор
+    успевает до начала мероприятия.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        send: Callable[[int, str], Awaitable[None]],
+        batch_size: int = 500,
+        refresh_interval: float = 60,
+        retry_delay: float = 30,
+        max_retry_delay: float = 900
+    ):
+        self._session_factory = session_factory
+        self._send = send
+        self._batch_size = batch_size
+        self._refresh_interval = refresh_interval
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._heap: List[Tuple[float, int]] = []
+        # id напоминания -> текущий срок срабатывания
+        self._fire_times: Dict[int, float] = {}
+        # id напоминания -> число неудачных отправок
+        self._attempts: Dict[int, int] = {}
+        self._max_minutes_before = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_id = 0
+        self._next_refresh = 0.0
+
+    def __len__(self):
+        return len(self._fire_times)
+
+    @staticmethod
+    def _fire_at(event_date: datetime, minutes_before: int) -> float:
+        return (as_utc(event_date) - timedelta(minutes=minutes_before or 0)).timestamp()
+
+    def schedule(self, reminder_id: int, event_date: datetime, minutes_before: int):
+        """Добавляет напоминание в очередь."""
+        self._last_id = max(self._last_id, reminder_id)
+        self.schedule_at(self._fire_at(event_date, minutes_before), reminder_id)
+
+    def schedule_at(self, fire_at: float, reminder_id: int):
+        self._fire_times[reminder_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, reminder_id))
+        # Будим цикл, если новое напоминание раньше текущего ожидания
+        if self._heap[0] == (fire_at, reminder_id):
+            self._wakeup.set()
+
+    async def load(self, after_id: int = 0) -> int:
+        """Загружает неотправленные напоминания о еще не начавшихся мероприятиях.
+
+        after_id ограничивает загрузку напоминаниями, созданными после
+        уже известных. Возвращает количество добавленных напоминаний.
+        """
+        now = datetime.now(timezone.utc)
+        loaded = []
+        async with self._session_factory() as db:
+            last_id = await db.scalar(select(func.max(Reminder.id)))
+            result = await db.stream(
+                select(Reminder.id, Event.date, Reminder.reminder_time)
+                .join(Event, Event.id == Reminder.event_id)
+                .where(Reminder.id > after_id, Reminder.sent_at.is_(None), Event.date > now)
+                .execution_options(yield_per=10000)
+            )
+            async for reminder_id, event_date, minutes_before in result:
+                loaded.append((self._fire_at(event_date, minutes_before), reminder_id))
+                self._max_minutes_before = max(self._max_minutes_before, minutes_before or 0)
+        self._last_id = max(self._last_id, last_id or 0)
+
+        if after_id:
+            for fire_at, reminder_id in loaded:
+                self.schedule_at(fire_at, reminder_id)
+        else:
+            self._heap.extend(loaded)
+            heapq.heapify(self._heap)
+            self._fire_times.update((reminder_id, fire_at) for fire_at, reminder_id in loaded)
+        return len(loaded)
+
+    async def reschedule_moved(self) -> int:
+        """Сдвигает напоминания о мероприятиях, перенесенных на более раннее время.
+
+        Проверяются только мероприятия, напоминания о которых по текущей
+        дате должны сработать до следующего обновления: остальные
+        успеют перечитаться позже. Возвращает количество сдвинутых.
+        """
+        now = datetime.now(timezone.utc)
+        horizon_ts = now.timestamp() + self._refresh_interval
+        horizon = now + timedelta(seconds=self._refresh_interval, minutes=self._max_minutes_before)
+        moved = 0
+        async with self._session_factory() as db:
+            rows = (await db.execute(
+                select(Reminder.id, Event.date, Reminder.reminder_time)
+                .join(Event, Event.id == Reminder.event_id)
+                .where(Reminder.sent_at.is_(None), Event.date > now, Event.date <= horizon)
+            )).all()
+        for reminder_id, event_date, minutes_before in rows:
+            fire_at = self._fire_at(event_date, minutes_before)
+            scheduled_at = self._fire_times.get(reminder_id)
+            if scheduled_at is not None and fire_at < scheduled_at and fire_at <= horizon_ts:
+                self.schedule_at(fire_at, reminder_id)
+                moved += 1
+        return moved
+
+    async def refresh(self):
+        """Догружает новые напоминания и сдвигает напоминания о перенесенных мероприятиях."""
+        added = await self.load(after_id=self._last_id)
+        if added:
+            logger.info(f"Loaded {added} new reminders")
+        moved = await self.reschedule_moved()
+        if moved:
+            logger.info(f"Rescheduled {moved} reminders for events moved earlier")
+
+    def _pop_due(self, now_ts: float) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts and len(due) < self._batch_size:
+            fire_at, reminder_id = heapq.heappop(self._heap)
+            # Запись, оставшаяся от прежнего срока после переноса
+            if self._fire_times.get(reminder_id) != fire_at:
+                continue
+            del self._fire_times[reminder_id]
+            due.append(reminder_id)
+        return due
+
+    def _retry(self, row, now_ts: float) -> bool:
+        """Планирует повтор неудачной отправки; False, если повтор опоздает к началу мероприятия."""
+        attempt = self._attempts.get(row.id, 0) + 1
+        retry_at = now_ts + min(self._retry_delay * 2 ** (attempt - 1), self._max_retry_delay)
+        if retry_at >= as_utc(row.date).timestamp():
+            self._attempts.pop(row.id, None)
+            return False
+        self._attempts[row.id] = attempt
+        self.schedule_at(retry_at, row.id)
+        return True
+
+    async def _fire(self, reminder_ids: List[int]):
+        # Данные читаются до отправки, чтобы не держать соединение с БД
+        # на время обращений к Telegram
+        async with self._session_factory() as db:
+            rows = (await db.execute(
+                select(Reminder.id, User.telegram_id, Event.title, Event.date, Reminder.reminder_time)
+                .join(User, User.id == Reminder.user_id)
+                .join(Event, Event.id == Reminder.event_id)
+                .where(Reminder.id.in_(reminder_ids), Reminder.sent_at.is_(None))
+            )).all()
+
+        # Мероприятие могли перенести после загрузки напоминания: такие
+        # напоминания возвращаются в очередь на новый срок. Напоминания об
+        # удаленных мероприятиях в выборку не попадают
+        now_ts = datetime.now(timezone.utc).timestamp()
+        found = {row.id for row in rows}
+        for reminder_id in reminder_ids:
+            if reminder_id not in found:
+                self._attempts.pop(reminder_id, None)
+        due = []
+        for row in rows:
+            fire_at = self._fire_at(row.date, row.reminder_time)
+            if as_utc(row.date).timestamp() <= now_ts:
+                # Мероприятие уже началось: напоминание опоздало
+                self._attempts.pop(row.id, None)
+                logger.warning(f"Skipping reminder {row.id}: event has already started")
+            elif fire_at > now_ts:
+                self.schedule_at(fire_at, row.id)
+            else:
+                due.append(row)
+
+        # Отправляем пачку параллельно, скорость ограничивает send
+        results = await asyncio.gather(*(
+            self._send(
+                row.telegram_id,
+                f"⏰ Напоминание: «{row.title}» начнется {as_utc(row.date):%d.%m.%Y в %H:%M} (UTC)"
+            )
+            for row in due
+        ), return_exceptions=True)
+
+        now_ts = datetime.now(timezone.utc).timestamp()
+        sent_ids = []
+        for row, result in zip(due, results):
+            if isinstance(result, Exception) or result is False:
+                if self._retry(row, now_ts):
+                    logger.warning(f"Error sending reminder {row.id}: {result}, will retry")
+                else:
+                    logger.error(f"Error sending reminder {row.id}: {result}, event starts before the next retry")
+            else:
+                self._attempts.pop(row.id, None)
+                sent_ids.append(row.id)
+
+        # Отмечаем отправленные напоминания одним UPDATE
+        if sent_ids:
+            async with self._session_factory() as db:
+                await db.execute(
+                    update(Reminder)
+                    .where(Reminder.id.in_(sent_ids))
+                    .values(sent_at=datetime.now(timezone.utc))
+                )
+                await db.commit()
+        logger.debug(f"Sent {len(sent_ids)} of {len(reminder_ids)} reminders")
+
+    async def run(self):
+        """Основной цикл: спит до ближайшего срока и отправляет напоминания."""
+        while True:
+            self._wakeup.clear()
+            now_ts = datetime.now(timezone.utc).timestamp()
+            if now_ts >= self._next_refresh:
+                self._next_refresh = now_ts + self._refresh_interval
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"Error loading new reminders: {e}")
+
+            timeout = self._next_refresh - now_ts
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now_ts)
+
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(datetime.now(timezone.utc).timestamp())
+            try:
+                await self._fire(due)
+            except Exception as e:
+                logger.error(f"Error processing reminders: {e}")
+
+    async def start(self):
+        await self.load()
+        self._next_refresh = datetime.now(timezone.utc).timestamp() + self._refresh_interval
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
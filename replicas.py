@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+class ReplicaSet:
+    """Реплики для чтения с выбором по кругу.
+
+    Фоновая задача периодически выполняет SELECT 1 на каждой реплике.
+    Недоступные реплики исключаются из ротации, пока проверка снова не
+    пройдет. Если доступных реплик нет, choose() возвращает None и
+    чтение идет с основной БД.
+    """
+
+    def __init__(self, engines: List, check_interval: float = 10, check_timeout: float = 2):
+        self._engines = list(engines)
+        self._check_interval = check_interval
+        self._check_timeout = check_timeout
+        self._healthy = list(self._engines)
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __bool__(self):
+        return bool(self._engines)
+
+    def choose(self):
+        """Следующая доступная реплика или None."""
+        healthy = self._healthy
+        if not healthy:
+            return None
+        self._next = (self._next + 1) % len(healthy)
+        return healthy[self._next]
+
+    async def _ping(self, engine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _is_healthy(self, engine) -> bool:
+        try:
+            # Таймаут покрывает и установку соединения: недоступный хост
+            # иначе держал бы проверку до таймаута TCP
+            await asyncio.wait_for(self._ping(engine), self._check_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"Replica {engine.url.host} health check failed: {e}")
+            return False
+
+    async def check(self):
+        """Проверяет все реплики и обновляет список доступных."""
+        results = await asyncio.gather(*(self._is_healthy(engine) for engine in self._engines))
+        healthy = [engine for engine, ok in zip(self._engines, results) if ok]
+        if len(healthy) != len(self._healthy):
+            logger.info(f"Healthy read replicas: {len(healthy)} of {len(self._engines)}")
+        self._healthy = healthy
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._check_interval)
+            await self.check()
+
+    async def start(self):
+        if not self._engines:
+            return
+        await self.check()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def dispose(self):
+        for engine in self._engines:
+            await engine.dispose()
@@ -0,0 +1,148 @@
+import logging
+from sqlalchemy import func, literal_column, or_, select, text
+
+logger = logging.getLogger(__name__)
+
+# Поисковый индекс создается миграцией add_events_search, а не при запуске
+# приложения: ALTER TABLE на большой таблице событий блокирует ее надолго
+
+# Синхронизация FTS5-индекса с таблицей events через триггеры
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        title, description, location,
+        content='events', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO events_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+]
+
+# Вычисляемая колонка tsvector обновляется самим Postgres
+POSTGRES_FTS_DDL = [
+    """
+    ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('{language}',
+            coalesce(title, '') || ' ' || coalesce(description, '') || ' ' || coalesce(location, ''))
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING GIN (search_vector)",
+]
+
+def create_search_index(conn, language: str = "russian"):
+    """Создает поисковый индекс в синхронном соединении (миграции, бенчмарк)."""
+    if conn.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            conn.execute(text(statement))
+        # Индексируем уже существующие мероприятия
+        conn.execute(text("INSERT INTO events_fts(events_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRES_FTS_DDL:
+            conn.execute(text(statement.format(language=language)))
+
+def search_index_exists(conn) -> bool:
+    if conn.dialect.name == "sqlite":
+        return bool(conn.scalar(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'"
+        )))
+    if conn.dialect.name == "postgresql":
+        return bool(conn.scalar(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'events' AND column_name = 'search_vector'"
+        )))
+    return False
+
+def drop_search_index(conn):
+    if conn.dialect.name == "sqlite":
+        for trigger in ("events_fts_ai", "events_fts_ad", "events_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS events_fts"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_events_search_vector"))
+        conn.execute(text("ALTER TABLE events DROP COLUMN IF EXISTS search_vector"))
+
+def to_fts5_query(search: str) -> str:
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки и ищется по префиксу.
+    """
+    terms = [term.replace('"', '""') for term in search.split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+class EventSearch:
+    """Полнотекстовый поиск по мероприятиям.
+
+    Бэкенд выбирается по диалекту БД: FTS5 для SQLite, tsvector с
+    GIN-индексом для Postgres, для остальных - поиск через ILIKE.
+    """
+
+    def __init__(self, event_model, dialect: str, language: str = "russian"):
+        self._event = event_model
+        self._backend = dialect
+        self._language = language
+
+    async def check(self, engine):
+        """Проверяет, что поисковый индекс создан миграцией.
+
+        Без индекса поиск работает через ILIKE, чтобы приложение
+        запускалось и на базе, созданной без миграций.
+        """
+        if self._backend not in ("sqlite", "postgresql"):
+            return
+        async with engine.connect() as conn:
+            exists = await conn.run_sync(search_index_exists)
+        if not exists:
+            logger.warning("Event search index is missing, run 'alembic upgrade head'. Falling back to ILIKE")
+            self._backend = "like"
+        logger.info(f"Event search backend: {self._backend}")
+
+    def apply(self, query, search: str):
+        """Добавляет к запросу фильтр поиска и сортировку по релевантности."""
+        Event = self._event
+
+        if self._backend == "sqlite":
+            fts_query = to_fts5_query(search)
+            if not fts_query:
+                return query
+            matches = (
+                select(literal_column("rowid").label("event_id"), literal_column("rank").label("rank"))
+                .select_from(text("events_fts"))
+                .where(text("events_fts MATCH :fts_query").bindparams(fts_query=fts_query))
+                .subquery()
+            )
+            # rank в FTS5 - это bm25, чем меньше, тем релевантнее
+            return query.join(matches, matches.c.event_id == Event.id).order_by(matches.c.rank)
+
+        if self._backend == "postgresql":
+            ts_query = func.websearch_to_tsquery(self._language, search)
+            search_vector = literal_column("events.search_vector")
+            return (
+                query.where(search_vector.op("@@")(ts_query))
+                .order_by(func.ts_rank(search_vector, ts_query).desc())
+            )
+
+        return query.where(or_(
+            Event.title.ilike(f"%{search}%"),
+            Event.description.ilike(f"%{search}%"),
+            Event.location.ilike(f"%{search}%")
+        ))
@@ -129,6 +129,10 @@ function createEventElement(event) {
     return div;
 }
 
+// Одна подписка на результаты всех показанных опросов: браузер держит
+// не больше 6 соединений на хост, поэтому поток на каждый опрос недопустим
+let pollStream = null;
+
 function displayPolls(polls) {
     const container = document.getElementById('polls-container');
     container.innerHTML = '';
@@ -137,6 +141,27 @@ function displayPolls(polls) {
         const pollElement = createPollElement(poll);
         container.appendChild(pollElement);
     });
+    subscribePollResults(polls.map(poll => poll.id));
+}
+
+function subscribePollResults(pollIds) {
+    if (pollStream) {
+        pollStream.close();
+        pollStream = null;
+    }
+    if (pollIds.length === 0) {
+        return;
+    }
+    pollStream = new EventSource(`/api/polls/live?ids=${pollIds.join(',')}`);
+    pollStream.addEventListener('results', (e) => {
+        const results = JSON.parse(e.data);
+        results.options.forEach(option => {
+            const counter = document.getElementById(`vote-count-${option.id}`);
+            if (counter) {
+                counter.textContent = `(${option.votes_count} голосов)`;
+            }
+        });
+    });
 }
 
 function createPollElement(poll) {
@@ -162,7 +187,7 @@ function createPollElement(poll) {
                     <input type="radio" name="poll_${poll.id}" value="${option.id}" 
                         ${option.voted ? 'checked' : ''}>
                     <label>${option.text}</label>
-                    <span class="vote-count">(${option.votes} голосов)</span>
+                    <span class="vote-count" id="vote-count-${option.id}">(${option.votes_count} голосов)</span>
                 </div>
             `).join('')}
         </div>
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+class TelegramAuth:
+    """Проверка initData из Telegram Web App.
+
+    Секретный ключ вычисляется один раз при создании. Уже проверенные
+    строки initData кешируются до истечения срока действия auth_date,
+    поэтому повторные запросы той же сессии не пересчитывают HMAC.
+    Ключ кеша - дайджест всей строки: строка с чужим hash, но другими
+    параметрами в кеш не попадает и проверяется заново.
+    """
+
+    def __init__(self, bot_token: str, max_age: int = 86400, cache_size: int = 10000):
+        self._secret_key = hmac.new(
+            key=b'WebAppData',
+            msg=(bot_token or '').encode(),
+            digestmod=hashlib.sha256
+        ).digest()
+        self._max_age = max_age
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+    def _sign(self, params: dict) -> str:
+        data_check_string = '\n'.join(f'{k}={v}' for k, v in sorted(params.items()))
+        return hmac.new(
+            key=self._secret_key,
+            msg=data_check_string.encode(),
+            digestmod=hashlib.sha256
+        ).hexdigest()
+
+    def _cache_get(self, key: bytes, now: float) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        context, expires_at = entry
+        if expires_at <= now:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return context
+
+    def _cache_put(self, key: bytes, context: dict, expires_at: float):
+        self._cache[key] = (context, expires_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def verify(self, init_data: str) -> Optional[dict]:
+        """Проверяет подпись и срок действия initData.
+
+        Возвращает разобранные данные или None, если проверка не пройдена.
+        """
+        try:
+            now = time.time()
+            cache_key = hashlib.sha256(init_data.encode()).digest()
+            cached = self._cache_get(cache_key, now)
+            if cached is not None:
+                return cached
+
+            params = dict(urllib.parse.parse_qsl(init_data))
+            hash_value = params.pop('hash', None)
+            if not hash_value:
+                return None
+
+            if not hmac.compare_digest(self._sign(params), hash_value):
+                return None
+
+            auth_date = int(params.get('auth_date', 0))
+            expires_at = auth_date + self._max_age if self._max_age else float('inf')
+            if expires_at <= now:
+                return None
+
+            if 'user' in params:
+                params['user'] = json.loads(params['user'])
+            self._cache_put(cache_key, params, expires_at)
+            return params
+        except Exception as e:
+            logger.error(f"Error verifying Telegram data: {e}")
+            return None
+
+def get_init_data(request: Request) -> Optional[str]:
+    """Достает initData из query-параметров или заголовка запроса."""
+    return request.query_params.get("initData") or request.headers.get("X-Telegram-Init-Data")
+
+def resolve_telegram_auth(request: Request, auth: TelegramAuth) -> Optional[dict]:
+    """Проверяет initData один раз за запрос и сохраняет результат в request.state."""
+    if not hasattr(request.state, "telegram_auth"):
+        init_data = get_init_data(request)
+        request.state.telegram_auth = auth.verify(init_data) if init_data else None
+    return request.state.telegram_auth
+
+class AdminRegistry:
+    """Множество Telegram id администраторов в памяти.
+
+    Объединяет ADMIN_USER_IDS из настроек и пользователей с is_admin в БД.
+    Загружается при старте и периодически обновляется в фоне, поэтому
+    проверка прав - это поиск во множестве без запросов к БД.
+    """
+
+    def __init__(self, session_factory, user_model, static_ids, refresh_interval: float = 60):
+        self._session_factory = session_factory
+        self._user = user_model
+        self._static_ids = set(static_ids)
+        self._refresh_interval = refresh_interval
+        self._admin_ids = set(self._static_ids)
+        self._task: Optional[asyncio.Task] = None
+
+    def is_admin(self, telegram_id) -> bool:
+        return telegram_id in self._admin_ids
+
+    async def refresh(self):
+        """Перечитывает администраторов из БД."""
+        try:
+            async with self._session_factory() as db:
+                db_ids = (await db.scalars(
+                    select(self._user.telegram_id).where(self._user.is_admin.is_(True))
+                )).all()
+            self._admin_ids = self._static_ids | set(db_ids)
+        except Exception as e:
+            logger.error(f"Error refreshing admin list: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            await self.refresh()
+
+    async def start(self):
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
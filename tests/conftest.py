@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте config, поэтому окружение задается до импорта приложения
+_tmp_dir = tempfile.mkdtemp(prefix="g-event-bot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ["BOT_MODE"] = "polling"
+for _name in ("RATE_LIMIT_AUTH", "RATE_LIMIT_VOTE", "RATE_LIMIT_EVENTS"):
+    os.environ.setdefault(_name, "1000000/60")
+
+import httpx
+import jwt
+import pytest
+
+@pytest.fixture(scope="session")
+async def app():
+    import webapp
+    await webapp.app.router.startup()
+    yield webapp
+    await webapp.app.router.shutdown()
+
+@pytest.fixture(scope="session")
+async def client(app):
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+def auth_header(user_id: int) -> dict:
+    token = jwt.encode({"user_id": user_id}, os.environ["JWT_SECRET"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime, timezone
+from activity import ActivityBuffer
+from models import User
+
+class FakeSession:
+    """Сессия, которая записывает параметры UPDATE или зависает на нем."""
+
+    def __init__(self, executed, block: asyncio.Event = None):
+        self.executed = executed
+        self.block = block
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt, params):
+        if self.block is not None:
+            self.block.set()
+            await asyncio.Event().wait()
+        self.executed.extend(params)
+
+    async def commit(self):
+        pass
+
+async def test_cancel_during_flush_keeps_batch():
+    executed, started = [], asyncio.Event()
+    sessions = iter([FakeSession(executed, block=started)])
+    buffer = ActivityBuffer(lambda: next(sessions, FakeSession(executed)), User.__table__, flush_interval=3600)
+
+    when = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    buffer.touch(1, when)
+    flush = asyncio.create_task(buffer.flush())
+    await started.wait()
+    flush.cancel()
+    try:
+        await flush
+    except asyncio.CancelledError:
+        pass
+
+    # Пачка вернулась в буфер и записывается при остановке
+    assert buffer.get(1) == when
+    await buffer.stop()
+    assert executed == [{"b_telegram_id": 1, "b_last_active": when}]
+    assert buffer.get(1) is None
@@ -0,0 +1,75 @@
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
+from conftest import auth_header
+
+ADMIN_ID = 900001
+
+async def seed_users(app):
+    now = datetime.now(timezone.utc)
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.User), [
+            {"telegram_id": 700000 + i, "username": f"listing_{i}", "last_active": now - timedelta(minutes=i)}
+            for i in range(30)
+        ] + [{"telegram_id": ADMIN_ID, "username": "listing_admin", "is_admin": True, "last_active": now}])
+        await db.commit()
+    await app.admin_registry.refresh()
+
+async def test_users_listing_with_naive_sqlite_datetimes(app, client):
+    await seed_users(app)
+    app.activity_buffer.touch(700001)
+
+    cursor, seen = None, 0
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/admin/users", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        seen += len(body["users"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen >= 31
+
+async def test_users_ndjson_requires_admin(app, client):
+    response = await client.get("/api/admin/users", params={"format": "ndjson"})
+    assert response.status_code == 401
+
+    response = await client.get("/api/admin/users", params={"format": "ndjson"}, headers=auth_header(700002))
+    assert response.status_code == 403
+
+    response = await client.get("/api/admin/users", params={"format": "ndjson", "limit": 7}, headers=auth_header(ADMIN_ID))
+    assert response.status_code == 200
+    lines = response.text.strip().split("\n")
+    assert len(lines) >= 31
+
+async def test_never_active_users_are_listed_last(app, client):
+    never_active = [760000 + i for i in range(12)]
+    async with app.SessionLocal() as db:
+        # Вставка через таблицу: ORM подставил бы значение по умолчанию вместо NULL
+        await db.execute(insert(app.User.__table__), [
+            {"telegram_id": telegram_id, "username": f"never_{telegram_id}", "last_active": None}
+            for telegram_id in never_active
+        ])
+        await db.commit()
+        total = await db.scalar(select(func.count(app.User.id)))
+
+    # Страницы пересекают границу между заходившими и никогда не заходившими
+    cursor, listed = None, []
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/admin/users", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        listed += body["users"]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert len(listed) == len({user["id"] for user in listed}) == total
+    tail = listed[-len(never_active):]
+    assert all(user["last_active"] is None for user in tail)
+    assert [user["id"] for user in tail] == sorted(never_active, reverse=True)
+
+    response = await client.get("/api/admin/users", params={"format": "ndjson", "limit": 5}, headers=auth_header(ADMIN_ID))
+    exported = [json.loads(line)["id"] for line in response.text.strip().split("\n")]
+    assert exported == [user["id"] for user in listed]
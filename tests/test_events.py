@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, insert, text
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+async def test_month_filter_rejects_out_of_range_year(client):
+    for year in (1969, 9999):
+        response = await client.get("/api/events", params={"month": 12, "year": year})
+        assert response.status_code == 422
+
+    response = await client.get("/api/events", params={"type": "past", "month": 12, "year": 9998})
+    assert response.status_code == 200
+
+async def test_event_listings_use_date_index(app, client):
+    now = datetime.now(timezone.utc)
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.Event), [
+            {"title": f"Event {i}", "description": "", "location": "", "category": "other",
+             "date": now + timedelta(days=i - 500)}
+            for i in range(1000)
+        ])
+        await db.commit()
+    async with app.engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+
+    for params in ({"type": "upcoming"}, {"type": "past"}, {"type": "upcoming", "month": now.month}):
+        with captured_statements(app.engine) as statements:
+            response = await client.get("/api/events", params=params)
+        assert response.status_code == 200
+
+        statement, parameters = next((s, p) for s, p in statements if "FROM events" in s)
+        async with app.engine.connect() as conn:
+            plan = (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all()
+        details = " ".join(row[-1] for row in plan)
+        assert "USING INDEX ix_events_date" in details, (params, details)
+        assert "TEMP B-TREE" not in details, (params, details)
+
+async def test_etag_changes_after_write_in_another_process(app, client):
+    response = await client.get("/api/events", params={"category": "etag"})
+    etag = response.headers["ETag"]
+    response = await client.get("/api/events", params={"category": "etag"}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Другой воркер добавляет мероприятие: версия меняется в общей таблице, а не в памяти этого процесса
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.Event), [{"title": "Other worker", "category": "etag", "date": datetime.now(timezone.utc) + timedelta(days=1)}])
+        await app.bump_versions(db, "events")
+        await db.commit()
+
+    response = await client.get("/api/events", params={"category": "etag"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == ["Other worker"]
+
+async def test_limit_returns_first_page(app, client):
+    now = datetime.now(timezone.utc)
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.Event), [
+            {"title": f"Page {i}", "category": "page", "date": now + timedelta(days=i + 1)} for i in range(5)
+        ])
+        await app.bump_versions(db, "events")
+        await db.commit()
+
+    response = await client.get("/api/events", params={"category": "page", "limit": 2})
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == ["Page 0", "Page 1"]
+
+    response = await client.get("/api/events", params={"category": "page", "limit": 1001})
+    assert response.status_code == 422
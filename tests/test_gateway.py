@@ -0,0 +1,105 @@
+import asyncio
+import time
+from aiohttp import web
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from telegram import Bot
+from bot import InstrumentedRequest
+from gateway import SendGateway
+from models import Base, MessageDelivery
+
+TOKEN = "123456:FAKE"
+
+class FakeBotApi:
+    """Минимальный Bot API: getMe и sendMessage с задержкой и разовым 429."""
+
+    def __init__(self, latency: float, flood_every: int = 0):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._calls = 0
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"
+            }})
+        data = await request.post()
+        self._calls += 1
+        if self.flood_every and self._calls % self.flood_every == 0:
+            return web.json_response(
+                {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 1}},
+                status=429
+            )
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        chat_id = int(data["chat_id"])
+        self.sent.append(chat_id)
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(self.sent), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}
+        }})
+
+async def start_fake_api(api: FakeBotApi):
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/bot"
+
+async def test_gateway_throughput_against_fake_bot_api(tmp_path):
+    api = FakeBotApi(latency=0.02, flood_every=200)
+    runner, base_url = await start_fake_api(api)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'deliveries.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine)
+
+    async def record(results):
+        async with session_factory() as db:
+            await db.execute(MessageDelivery.__table__.insert(), results)
+            await db.commit()
+
+    bot = Bot(TOKEN, base_url=base_url, request=InstrumentedRequest(connection_pool_size=64))
+    await bot.initialize()
+
+    async def send_message(chat_id, text):
+        await bot.send_message(chat_id=chat_id, text=text)
+
+    rate, messages = 200, 300
+    gateway = SendGateway(send_message, record=record, global_rate=rate, per_chat_rate=1, max_concurrency=16)
+    gateway.start()
+    # id каналов и супергрупп выходят за пределы 32 бит
+    chat_ids = [-1001234567890 - i for i in range(messages)]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(gateway.send(chat_id, "hello") for chat_id in chat_ids))
+    elapsed = time.perf_counter() - started
+    await gateway.stop()
+    await bot.shutdown()
+    await runner.cleanup()
+
+    assert all(results)
+    assert sorted(api.sent) == sorted(chat_ids)
+    assert api.max_in_flight <= 16
+    # Первые rate сообщений идут из запаса ведра, остальные не быстрее rate в секунду.
+    # Во время паузы retry_after после 429 ведро пополняется, поэтому пауза и ожидание
+    # токенов перекрываются, а не складываются
+    assert elapsed >= max((messages - rate) / rate, 1)
+    # Шлюз упирается в лимит, а не в задержку вызовов: последовательная
+    # отправка заняла бы messages * latency = 6 секунд
+    assert elapsed < (messages - rate) / rate + 1 + 3
+    print(f"\n{messages} messages in {elapsed:.2f}s ({messages / elapsed:.0f} msg/s)")
+
+    async with session_factory() as db:
+        delivered = (await db.scalars(select(MessageDelivery.chat_id).where(MessageDelivery.status == "sent"))).all()
+    assert sorted(delivered) == sorted(chat_ids)
+    await engine.dispose()
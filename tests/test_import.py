@@ -0,0 +1,42 @@
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
+from conftest import auth_header
+
+ADMIN_ID = 900301
+
+async def imported_count(app) -> int:
+    async with app.SessionLocal() as db:
+        return await db.scalar(select(func.count(app.Event.id)).where(app.Event.category == "imported"))
+
+async def test_import_writes_after_upload_in_short_transactions(app, client, monkeypatch):
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.User), [{"telegram_id": ADMIN_ID, "username": "import_admin", "is_admin": True}])
+        await db.commit()
+        version_before = (await app.read_versions(db))["events"]
+    await app.admin_registry.refresh()
+    monkeypatch.setattr(app.settings, "IMPORT_BATCH_SIZE", 2)
+
+    date = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    lines = [
+        json.dumps({"title": f"Imported {i}", "description": "Imported", "date": date, "category": "imported"}) + "\n"
+        for i in range(5)
+    ] + ['{"title": "Without date"}\n']
+
+    async def body():
+        for line in lines:
+            # Пока тело загружается, в БД ничего не пишется
+            assert await imported_count(app) == 0
+            yield line.encode()
+
+    response = await client.post(
+        "/api/events/import", params={"format": "ndjson"}, content=body(), headers=auth_header(ADMIN_ID)
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["imported"] == 5
+    assert [error["row"] for error in response.json()["errors"]] == [6]
+    assert await imported_count(app) == 5
+
+    # Каждая из трех пачек - отдельная транзакция со своим увеличением версии
+    async with app.SessionLocal() as db:
+        assert (await app.read_versions(db))["events"] == version_before + 3
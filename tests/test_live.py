@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from live import PollBroadcaster
+
+async def test_live_stream_rejects_unknown_polls(app, client):
+    response = await client.get("/api/polls/live", params={"ids": "987654"})
+    assert response.status_code == 404
+
+    response = await client.get("/api/polls/live", params={"ids": "1,abc"})
+    assert response.status_code == 422
+
+async def test_one_subscription_receives_all_its_polls():
+    loads = []
+
+    async def load(poll_id):
+        loads.append(poll_id)
+        return {"poll_id": poll_id, "options": []}
+
+    broadcaster = PollBroadcaster(load, interval=0.01)
+    subscription = broadcaster.subscribe([1, 2])
+    other = broadcaster.subscribe([3])
+
+    # Серия изменений одного опроса объединяется в одну загрузку
+    for _ in range(5):
+        broadcaster.publish(1)
+    broadcaster.publish(2)
+    await asyncio.sleep(0.05)
+
+    messages = await asyncio.wait_for(subscription.get(), timeout=1)
+    assert sorted(loads) == [1, 2]
+    assert len(messages) == 2 and all(m.startswith("event: results") for m in messages)
+    assert not other._ready.is_set()
+
+    broadcaster.unsubscribe(subscription)
+    broadcaster.unsubscribe(other)
+    broadcaster.publish(1)
+    await asyncio.sleep(0.05)
+    assert sorted(loads) == [1, 2]
+
+async def test_disconnect_removes_subscription(app):
+    async with app.SessionLocal() as db:
+        poll = app.Poll(
+            title="Live", description="", end_date=datetime.now(timezone.utc) + timedelta(days=1),
+            options=[app.PollOption(text="A")]
+        )
+        db.add(poll)
+        await db.commit()
+        poll_id = poll.id
+
+    # Поток бесконечный, поэтому запрос выполняется напрямую через ASGI
+    disconnected = asyncio.Event()
+    first_event = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and b"event: results" in message.get("body", b""):
+            first_event.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/api/polls/live", "raw_path": b"/api/polls/live", "root_path": "",
+        "query_string": f"ids={poll_id}".encode(), "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 0), "server": ("test", 80),
+    }
+    task = asyncio.create_task(app.app(scope, receive, send))
+    await asyncio.wait_for(first_event.wait(), timeout=5)
+    assert poll_id in app.poll_broadcaster._subscribers
+
+    disconnected.set()
+    await asyncio.wait_for(task, timeout=5)
+    assert poll_id not in app.poll_broadcaster._subscribers
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, text
+
+CONCURRENCY = 200
+
+async def seed_events(app, count):
+    now = datetime.now(timezone.utc)
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.Event), [
+            {
+                "title": f"Event {i}",
+                "description": "load test",
+                "date": now + timedelta(hours=i - count // 2),
+                "location": "Hall",
+                "category": "meeting",
+            }
+            for i in range(count)
+        ])
+        await db.commit()
+
+async def test_concurrent_requests_throughput(app, client):
+    await seed_events(app, 2000)
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.get("/api/events", params={"type": "upcoming", "category": "meeting"})
+        for _ in range(CONCURRENCY)
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert all(r.status_code == 200 for r in responses)
+    print(f"{CONCURRENCY} concurrent /api/events requests: {CONCURRENCY / elapsed:.0f} req/s")
+
+async def test_slow_query_does_not_block_event_loop(app, client):
+    """Медленный запрос к БД не останавливает event loop для других запросов."""
+    max_gap = 0.0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_gap
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            max_gap = max(max_gap, now - last)
+            last = now
+
+    async def slow_query():
+        async with app.SessionLocal() as db:
+            started = time.perf_counter()
+            await db.execute(text("SELECT count(*) FROM events a, events b, (SELECT 1 UNION SELECT 2 UNION SELECT 3 UNION SELECT 4 UNION SELECT 5 UNION SELECT 6 UNION SELECT 7 UNION SELECT 8) c"))
+            return time.perf_counter() - started
+
+    ticker_task = asyncio.create_task(ticker())
+    slow_task = asyncio.create_task(slow_query())
+    await asyncio.sleep(0.01)
+
+    # Обычные запросы обслуживаются, пока медленный запрос еще выполняется
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.get("/api/polls") for _ in range(20)))
+    fast_elapsed = time.perf_counter() - started
+    slow_elapsed = await slow_task
+    stop.set()
+    await ticker_task
+
+    assert all(r.status_code == 200 for r in responses)
+    print(f"slow query {slow_elapsed:.2f}s, 20 requests {fast_elapsed:.2f}s, max loop stall {max_gap * 1000:.1f}ms")
+    assert not slow_task.cancelled()
+    assert fast_elapsed < slow_elapsed
+    assert max_gap < slow_elapsed / 2
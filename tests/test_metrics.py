@@ -0,0 +1,35 @@
+import aiohttp
+from sqlalchemy import insert
+import metrics
+from conftest import auth_header
+
+async def test_bot_metrics_server_exposes_registry():
+    metrics.BOT_UPDATES.inc("message")
+    runner = await metrics.start_http_server(0, host="127.0.0.1")
+    try:
+        host, port = runner.addresses[0][:2]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://{host}:{port}/metrics") as response:
+                assert response.status == 200
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                body = await response.text()
+    finally:
+        await runner.cleanup()
+    assert 'bot_updates_total{type="message"}' in body
+
+async def test_streaming_response_records_db_queries(app, client):
+    admin_id = 900201
+    async with app.SessionLocal() as db:
+        await db.execute(insert(app.User), [{"telegram_id": admin_id, "username": "metrics_admin", "is_admin": True}])
+        await db.commit()
+    await app.admin_registry.refresh()
+
+    route = "/api/admin/export/{entity}"
+    before = metrics.DB_QUERIES_PER_REQUEST._values.get((route,), [[], 0.0, 0])[1:]
+    response = await client.get("/api/admin/export/events", headers=auth_header(admin_id))
+    assert response.status_code == 200
+    queries, count = metrics.DB_QUERIES_PER_REQUEST._values[(route,)][1:]
+
+    # Запросы выгрузки выполняются во время передачи тела и тоже учитываются
+    assert count == before[1] + 1
+    assert queries > before[0]
@@ -0,0 +1,25 @@
+from conftest import auth_header
+from ratelimit import MemoryRateLimitStore, RateLimiter
+
+async def test_votes_are_limited_per_authenticated_user(app, client, monkeypatch):
+    monkeypatch.setattr(app, "rate_limiter", RateLimiter(MemoryRateLimitStore(), [
+        ("POST", r"^/api/polls/\d+/vote$", "2/60"),
+    ]))
+
+    # Все запросы приходят с одного IP (как за прокси), но от разных пользователей
+    statuses = [
+        (await client.post("/api/polls/999999/vote", json={"optionIndex": 0}, headers=auth_header(810001))).status_code
+        for _ in range(3)
+    ]
+    assert 429 not in statuses[:2] and statuses[2] == 429
+
+    response = await client.post("/api/polls/999999/vote", json={"optionIndex": 0}, headers=auth_header(810002))
+    assert response.status_code != 429
+
+async def test_memory_store_is_bounded():
+    store = MemoryRateLimitStore(max_keys=3)
+    for i in range(10):
+        await store.increment(f"user:{i}", window_index=100, window=60)
+    assert len(store) == 3
+    # Недавно использованный ключ сохраняет свой счетчик
+    assert await store.increment("user:9", window_index=100, window=60) == (2, 0)
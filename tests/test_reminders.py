@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from models import Base, Event, Reminder, User
+from reminders import ReminderScheduler
+
+async def make_scheduler(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'reminders.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append(chat_id)
+
+    return engine, session_factory, ReminderScheduler(session_factory, send, refresh_interval=3600), sent
+
+async def add_reminder(session_factory, telegram_id, event_date, minutes_before=10):
+    async with session_factory() as db:
+        user = User(telegram_id=telegram_id, username=str(telegram_id))
+        event = Event(title=f"Event {telegram_id}", date=event_date)
+        db.add_all([user, event])
+        await db.flush()
+        reminder = Reminder(user_id=user.id, event_id=event.id, reminder_time=minutes_before)
+        db.add(reminder)
+        await db.commit()
+        return reminder.id, event.id
+
+async def test_fire_rechecks_event_date(tmp_path):
+    engine, session_factory, scheduler, sent = await make_scheduler(tmp_path)
+    # Напоминание за 10 минут до мероприятия через 5 минут уже должно сработать
+    soon = datetime.now(timezone.utc) + timedelta(minutes=5)
+    on_time, _ = await add_reminder(session_factory, 1, soon)
+    moved, moved_event = await add_reminder(session_factory, 2, soon)
+    deleted, deleted_event = await add_reminder(session_factory, 3, soon)
+    await scheduler.load()
+
+    async with session_factory() as db:
+        await db.execute(update(Event).where(Event.id == moved_event).values(date=soon + timedelta(days=1)))
+        await db.execute(delete(Event).where(Event.id == deleted_event))
+        await db.commit()
+
+    due = scheduler._pop_due(datetime.now(timezone.utc).timestamp())
+    assert sorted(due) == [on_time, moved, deleted]
+    await scheduler._fire(due)
+
+    assert sent == [1]
+    assert [reminder_id for _, reminder_id in scheduler._heap] == [moved]
+    async with session_factory() as db:
+        sent_ids = (await db.scalars(select(Reminder.id).where(Reminder.sent_at.is_not(None)))).all()
+    assert sent_ids == [on_time]
+    await engine.dispose()
+
+async def test_refresh_picks_up_new_reminders(tmp_path):
+    engine, session_factory, scheduler, sent = await make_scheduler(tmp_path)
+    event_date = datetime.now(timezone.utc) + timedelta(hours=1)
+    first, _ = await add_reminder(session_factory, 1, event_date)
+    await scheduler.load()
+    second, _ = await add_reminder(session_factory, 2, event_date)
+
+    await scheduler.refresh()
+    await scheduler.refresh()
+    assert sorted(reminder_id for _, reminder_id in scheduler._heap) == [first, second]
+    await engine.dispose()
+
+async def test_failed_send_is_retried_with_backoff(tmp_path):
+    engine, session_factory, _, _ = await make_scheduler(tmp_path)
+    attempts = []
+
+    async def flaky_send(chat_id, text):
+        attempts.append(chat_id)
+        return len(attempts) > 2
+
+    scheduler = ReminderScheduler(session_factory, flaky_send, refresh_interval=3600, retry_delay=10, max_retry_delay=15)
+    soon = datetime.now(timezone.utc) + timedelta(minutes=5)
+    reminder_id, _ = await add_reminder(session_factory, 1, soon)
+    await scheduler.load()
+
+    delays = []
+    for _ in range(3):
+        now_ts = datetime.now(timezone.utc).timestamp()
+        await scheduler._fire(scheduler._pop_due(max(now_ts, scheduler._heap[0][0])))
+        if scheduler._heap:
+            delays.append(scheduler._heap[0][0] - now_ts)
+    # Задержка удваивается, но не превышает max_retry_delay
+    assert [round(delay) for delay in delays] == [10, 15]
+    assert len(attempts) == 3 and len(scheduler) == 0
+    async with session_factory() as db:
+        assert await db.scalar(select(Reminder.sent_at).where(Reminder.id == reminder_id)) is not None
+    await engine.dispose()
+
+async def test_refresh_moves_reminder_for_event_moved_earlier(tmp_path):
+    engine, session_factory, scheduler, sent = await make_scheduler(tmp_path)
+    scheduler._refresh_interval = 60
+    reminder_id, event_id = await add_reminder(session_factory, 1, datetime.now(timezone.utc) + timedelta(days=1))
+    await scheduler.load()
+
+    # Мероприятие перенесли на через 5 минут: напоминание за 10 минут уже пора отправить
+    new_date = datetime.now(timezone.utc) + timedelta(minutes=5)
+    async with session_factory() as db:
+        await db.execute(update(Event).where(Event.id == event_id).values(date=new_date))
+        await db.commit()
+    await scheduler.refresh()
+    assert scheduler._heap[0] == ((new_date - timedelta(minutes=10)).timestamp(), reminder_id)
+
+    # Старая запись кучи не приводит к повторной отправке
+    await scheduler._fire(scheduler._pop_due(float("inf")))
+    assert sent == [1]
+    assert scheduler._pop_due(float("inf")) == []
+    await engine.dispose()
+
+async def test_reminder_for_started_event_is_skipped(tmp_path):
+    engine, session_factory, scheduler, sent = await make_scheduler(tmp_path)
+    reminder_id, event_id = await add_reminder(session_factory, 1, datetime.now(timezone.utc) + timedelta(hours=1))
+    await scheduler.load()
+    async with session_factory() as db:
+        await db.execute(update(Event).where(Event.id == event_id).values(date=datetime.now(timezone.utc)))
+        await db.commit()
+
+    await scheduler._fire(scheduler._pop_due(float("inf")))
+    assert sent == [] and len(scheduler) == 0
+    await engine.dispose()
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from conftest import auth_header
+from replicas import ReplicaSet
+
+class HangingEngine:
+    """Движок, чье соединение не устанавливается (недоступный хост)."""
+
+    url = SimpleNamespace(host="unreachable")
+
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(3600)
+        yield
+
+async def test_health_check_times_out_on_connect():
+    replicas = ReplicaSet([HangingEngine()], check_timeout=0.1)
+    started = time.perf_counter()
+    await replicas.check()
+    assert time.perf_counter() - started < 1
+    assert replicas.choose() is None
+
+async def test_listings_and_stats_read_from_replica(app, client, monkeypatch):
+    # В роли реплики выступает основная БД: проверяется только выбор сессии
+    chosen = []
+
+    def choose():
+        chosen.append(True)
+        return app.engine
+
+    monkeypatch.setattr(app.replica_set, "choose", choose)
+    monkeypatch.setattr(app.replica_set, "_engines", [app.engine])
+    for path in ("/api/events", "/api/polls", "/api/stats"):
+        chosen.clear()
+        response = await client.get(path)
+        assert response.status_code == 200, (path, response.text)
+        assert chosen, path
+
+    # Пользователь, только что изменивший данные, читает основную БД
+    monkeypatch.setattr(app.replica_set, "choose", refuse_replica)
+    app.recent_writers.add(820001)
+    response = await client.get("/api/polls", headers=auth_header(820001))
+    assert response.status_code == 200
+
+def refuse_replica():
+    raise AssertionError("read replica used")
+
+def test_write_tracking_needs_replicas(app):
+    # Без DATABASE_REPLICA_URLS middleware read-your-writes не подключается
+    assert not app.replica_set
+    assert all(getattr(m, "kwargs", {}).get("dispatch") is not app.track_writes for m in app.app.user_middleware)
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from models import Base, Event
+from search import EventSearch
+
+def run_migration(conn, step):
+    from migrations.versions import add_events_search as migration
+
+    with Operations.context(MigrationContext.configure(conn)):
+        getattr(migration, step)()
+
+async def search_titles(engine, event_search, search):
+    async with engine.connect() as conn:
+        query = event_search.apply(select(Event.title), search)
+        return (await conn.scalars(query)).all()
+
+async def test_search_index_comes_from_migration(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Event), [
+            {"title": "Джазовый концерт", "description": "", "location": "Зал 1", "date": datetime.now(timezone.utc)},
+            {"title": "Шахматный турнир", "description": "", "location": "Зал 2", "date": datetime.now(timezone.utc)},
+        ])
+
+    # Без миграции поиск работает через ILIKE
+    event_search = EventSearch(Event, "sqlite")
+    await event_search.check(engine)
+    assert event_search._backend == "like"
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migration, "upgrade")
+        await conn.execute(insert(Event), [
+            {"title": "Джазовый фестиваль", "description": "", "location": "", "date": datetime.now(timezone.utc)},
+        ])
+
+    event_search = EventSearch(Event, "sqlite")
+    await event_search.check(engine)
+    assert event_search._backend == "sqlite"
+    # Находятся и события, существовавшие до миграции, и добавленные триггером
+    assert sorted(await search_titles(engine, event_search, "джаз")) == ["Джазовый концерт", "Джазовый фестиваль"]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migration, "downgrade")
+    event_search = EventSearch(Event, "sqlite")
+    await event_search.check(engine)
+    assert event_search._backend == "like"
+    await engine.dispose()
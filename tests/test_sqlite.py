@@ -0,0 +1,36 @@
+from sqlalchemy import select, text
+import database
+
+async def test_connections_use_wal_and_pragmas(app):
+    for engine in (database.engine, database.write_engine):
+        async with engine.connect() as conn:
+            assert (await conn.scalar(text("PRAGMA journal_mode"))).lower() == "wal"
+            assert await conn.scalar(text("PRAGMA synchronous")) == 1  # NORMAL
+            assert await conn.scalar(text("PRAGMA busy_timeout")) == database.settings.SQLITE_BUSY_TIMEOUT_MS
+
+async def test_writes_go_through_single_writer_connection(app):
+    assert database.write_engine is not database.engine
+    assert database.write_engine.pool.size() == 1
+
+    async with database.SessionLocal() as db:
+        # Чтение до первой записи идет через пул читателей
+        assert db.sync_session.get_bind(clause=select(app.User.id)) is database.engine.sync_engine
+        db.add(app.User(telegram_id=424242, username="writer_test"))
+        await db.flush()
+        # После записи сессия остается на соединении писателя
+        assert db.sync_session.get_bind(clause=select(app.User.id)) is database.write_engine.sync_engine
+        assert await db.scalar(select(app.User.id).where(app.User.telegram_id == 424242))
+        await db.commit()
+
+async def test_concurrent_writes_do_not_lock(app):
+    import asyncio
+
+    async def write(i):
+        async with database.SessionLocal() as db:
+            db.add(app.User(telegram_id=500000 + i, username=f"concurrent_{i}"))
+            await db.commit()
+
+    await asyncio.gather(*(write(i) for i in range(50)))
+    async with database.SessionLocal() as db:
+        count = await db.scalar(text("SELECT count(*) FROM users WHERE username LIKE 'concurrent_%'"))
+    assert count == 50
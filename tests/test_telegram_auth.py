@@ -0,0 +1,35 @@
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+from telegram_auth import TelegramAuth
+
+TOKEN = "123456:FAKE"
+
+def sign_init_data(params: dict) -> str:
+    secret_key = hmac.new(b"WebAppData", TOKEN.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(params.items()))
+    hash_value = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode({**params, "hash": hash_value})
+
+def test_cached_hash_does_not_authorize_tampered_init_data():
+    auth = TelegramAuth(TOKEN)
+    params = {"auth_date": str(int(time.time())), "user": json.dumps({"id": 1, "first_name": "Alice"})}
+    init_data = sign_init_data(params)
+
+    assert auth.verify(init_data)["user"]["id"] == 1
+    # Повторный запрос той же строки берется из кеша
+    assert auth.verify(init_data)["user"]["id"] == 1
+
+    # Подмена пользователя с уже проверенным hash
+    known_hash = dict(urllib.parse.parse_qsl(init_data))["hash"]
+    forged = urllib.parse.urlencode({
+        **params, "user": json.dumps({"id": 2, "first_name": "Mallory"}), "hash": known_hash
+    })
+    assert auth.verify(forged) is None
+
+def test_expired_init_data_is_rejected():
+    auth = TelegramAuth(TOKEN, max_age=60)
+    init_data = sign_init_data({"auth_date": str(int(time.time()) - 120), "user": json.dumps({"id": 1})})
+    assert auth.verify(init_data) is None
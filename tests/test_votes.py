@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import insert, select
+from conftest import auth_header
+from votes import VoteIngestor
+
+VOTER_IDS = range(810000, 810020)
+ADMIN_ID = 810100
+
+async def seed_poll(app, options=("A", "B")) -> int:
+    async with app.SessionLocal() as db:
+        poll = app.Poll(
+            title="Votes", description="", end_date=datetime.now(timezone.utc) + timedelta(days=1),
+            options=[app.PollOption(text=text) for text in options]
+        )
+        db.add(poll)
+        existing = set((await db.scalars(select(app.User.telegram_id).where(app.User.telegram_id.in_(VOTER_IDS)))).all())
+        new_users = [{"telegram_id": user_id, "username": f"voter_{user_id}"} for user_id in VOTER_IDS if user_id not in existing]
+        if new_users:
+            await db.execute(insert(app.User), new_users)
+        await db.commit()
+        return poll.id
+
+async def option_counts(app, poll_id):
+    async with app.SessionLocal() as db:
+        return list((await db.scalars(
+            select(app.PollOption.votes_count).where(app.PollOption.poll_id == poll_id).order_by(app.PollOption.id)
+        )).all())
+
+async def test_stop_writes_queued_votes(app):
+    poll_id = await seed_poll(app)
+    # Долгая задержка пачки: голоса гарантированно ждут в очереди во время stop()
+    ingestor = VoteIngestor(app.SessionLocal, (app.Poll, app.PollOption, app.Vote, app.User), max_delay=1)
+    ingestor.start()
+
+    # Первый голос приходит в пустую очередь, фоновая задача забирает его и ждет пачку
+    submits = [asyncio.create_task(ingestor.submit(poll_id, VOTER_IDS[0], 0))]
+    while ingestor._queue._unfinished_tasks < 1 or not ingestor._queue.empty():
+        await asyncio.sleep(0.01)
+    # Остальные голоса ждут в очереди
+    submits += [asyncio.create_task(ingestor.submit(poll_id, user_id, 0)) for user_id in VOTER_IDS[1:]]
+    while ingestor._queue.qsize() < len(VOTER_IDS) - 1:
+        await asyncio.sleep(0.01)
+    await ingestor.stop()
+
+    assert [await task for task in submits] == ["accepted"] * len(VOTER_IDS)
+    assert await option_counts(app, poll_id) == [len(VOTER_IDS), 0]
+
+async def test_unknown_user_is_rejected_in_batch(app):
+    poll_id = await seed_poll(app)
+    ingestor = VoteIngestor(app.SessionLocal, (app.Poll, app.PollOption, app.Vote, app.User), max_delay=0.05)
+    ingestor.start()
+
+    # Пользователи проверяются одним запросом на пачку: неизвестный не мешает остальным
+    unknown_id = 819999
+    results = await asyncio.gather(
+        *(ingestor.submit(poll_id, user_id, 1) for user_id in (*VOTER_IDS[:3], unknown_id)),
+        return_exceptions=True
+    )
+    await ingestor.stop()
+
+    assert results[:3] == ["accepted"] * 3
+    assert results[3].status_code == 404
+    assert await option_counts(app, poll_id) == [0, 3]
+
+async def test_vote_for_removed_option_is_rejected(app, client):
+    poll_id = await seed_poll(app)
+    async with app.SessionLocal() as db:
+        old_option_ids = list((await db.scalars(
+            select(app.PollOption.id).where(app.PollOption.poll_id == poll_id).order_by(app.PollOption.id)
+        )).all())
+        await db.execute(insert(app.User), [{"telegram_id": ADMIN_ID, "username": "votes_admin", "is_admin": True}])
+        await db.commit()
+    await app.admin_registry.refresh()
+
+    # Вариант B заменяется на C
+    response = await client.put(f"/api/polls/{poll_id}", headers=auth_header(ADMIN_ID), json={
+        "title": "Votes", "description": "", "options": [{"text": "A"}, {"text": "C"}],
+        "endDate": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    })
+    assert response.status_code == 200, response.text
+
+    # Кеш, прочитанный одновременно с изменением опроса, ссылается на удаленный вариант
+    app.vote_ingestor._polls[poll_id] = (None, old_option_ids, float("inf"))
+    response = await client.post(f"/api/polls/{poll_id}/vote", headers=auth_header(VOTER_IDS[0]), json={"optionIndex": 1})
+    assert response.status_code == 409
+
+    # После сброса кеша голос попадает в новый вариант и сразу виден в списке
+    response = await client.post(f"/api/polls/{poll_id}/vote", headers=auth_header(VOTER_IDS[0]), json={"optionIndex": 1})
+    assert response.status_code == 200, response.text
+    polls = (await client.get("/api/polls")).json()
+    poll = next(poll for poll in polls if poll["id"] == poll_id)
+    assert [option["text"] for option in poll["options"]] == ["A", "C"]
+    assert [option["votes_count"] for option in poll["options"]] == [0, 1]
+
+def test_migration_deduplicates_votes(tmp_path):
+    from migrations.versions import add_votes_poll_user_unique as migration
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Схема create_all старой модели: без poll_id и ограничения
+        conn.exec_driver_sql("CREATE TABLE poll_options (id INTEGER PRIMARY KEY, poll_id INTEGER, votes_count INTEGER DEFAULT 0)")
+        conn.exec_driver_sql("CREATE TABLE votes (id INTEGER PRIMARY KEY, user_id INTEGER, option_id INTEGER, created_at DATETIME)")
+        conn.exec_driver_sql("INSERT INTO poll_options (id, poll_id, votes_count) VALUES (1, 1, 5), (2, 1, 5)")
+        conn.exec_driver_sql("INSERT INTO votes (id, user_id, option_id) VALUES (1, 10, 1), (2, 10, 2), (3, 11, 2)")
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+
+        votes = conn.exec_driver_sql("SELECT id, poll_id, user_id FROM votes ORDER BY id").all()
+        counts = conn.exec_driver_sql("SELECT votes_count FROM poll_options ORDER BY id").scalars().all()
+        indexes = {index["name"]: index for index in sa.inspect(conn).get_indexes("votes")}
+
+    assert [tuple(row) for row in votes] == [(1, 1, 10), (3, 1, 11)]
+    assert counts == [1, 1]
+    assert indexes["uq_votes_poll_user"]["unique"]
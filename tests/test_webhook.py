@@ -0,0 +1,23 @@
+from bot import acquire_leader_lock
+
+async def test_webhook_secret_with_non_ascii_header(app, client, monkeypatch):
+    monkeypatch.setattr(app.app.state, "bot_application", object())
+    monkeypatch.setattr(app.settings, "WEBHOOK_SECRET", "secret")
+    # Starlette декодирует заголовок как latin-1, получается строка не из ASCII
+    response = await client.post(
+        app.settings.WEBHOOK_PATH,
+        headers={"X-Telegram-Bot-Api-Secret-Token": "секрет".encode()},
+        json={}
+    )
+    assert response.status_code == 403
+
+def test_only_one_process_holds_the_bot_lock(tmp_path):
+    path = str(tmp_path / "bot.lock")
+    leader = acquire_leader_lock(path)
+    assert leader is not None
+    # Второй воркер получает отказ, пока первый держит блокировку
+    assert acquire_leader_lock(path) is None
+    leader.close()
+    follower = acquire_leader_lock(path)
+    assert follower is not None
+    follower.close()
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Sequence
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбивает поток байтов на строки без загрузки всего тела в память."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, str]]:
+    """Построчно читает CSV с заголовком.
+
+    Запись может занимать несколько строк, если поле в кавычках содержит
+    перевод строки: строки копятся, пока число кавычек не станет четным.
+    """
+    header = None
+    pending = []
+    async for line in iter_lines(chunks):
+        pending.append(line)
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            continue
+        pending = []
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield dict(zip(header, values))
+    if pending:
+        raise ValueError("Unterminated quoted field at end of CSV")
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Построчно читает NDJSON, пустые строки пропускаются.
+
+    Возвращает сырые строки: JSON разбирает вызывающий код, чтобы ошибка
+    относилась к конкретной записи, а не прерывала весь поток.
+    """
+    async for line in iter_lines(chunks):
+        if line.strip():
+            yield line
+
+def export_value(value):
+    """Приводит значение из БД к виду, пригодному для CSV и JSON."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def csv_line(values: Sequence) -> str:
+    """Форматирует одну строку CSV."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow([export_value(value) for value in values])
+    return buffer.getvalue()
+
+def ndjson_line(columns: Sequence[str], values: Sequence) -> str:
+    """Форматирует одну запись NDJSON."""
+    record = {column: export_value(value) for column, value in zip(columns, values)}
+    return json.dumps(record, ensure_ascii=False) + "\n"
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, select, tuple_, update
+from cache import LRUSet
+from database import insert_ignore
+
+logger = logging.getLogger(__name__)
+
+class VoteIngestor:
+    """Пакетный прием голосов.
+
+    Голос проверяется по закешированным данным опроса и ставится в
+    очередь. Фоновая задача записывает очередь пачками через
+    INSERT ... ON CONFLICT (poll_id, user_id) DO NOTHING, опираясь на
+    ограничение uq_votes_poll_user, и сообщает каждому вызывающему,
+    принят голос или он повторный. Пользователи, которых нет в кеше,
+    проверяются одним запросом на пачку, а не запросом на голос.
+
+    on_write вызывается в транзакции пачки перед коммитом (например,
+    чтобы увеличить версию списка опросов), on_flush - после коммита.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        models,
+        on_write: Optional[Callable[[object, Set[int]], Awaitable[None]]] = None,
+        on_flush: Optional[Callable[[Set[int]], None]] = None,
+        batch_size: int = 500,
+        max_delay: float = 0.01,
+        poll_cache_ttl: float = 30,
+        known_users_size: int = 100000
+    ):
+        self._session_factory = session_factory
+        self._poll, self._option, self._vote, self._user = models
+        self._on_write = on_write
+        self._on_flush = on_flush
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+        self._poll_cache_ttl = poll_cache_ttl
+        self._polls: Dict[int, Tuple[Optional[datetime], List[int], float]] = {}
+        # Идущие загрузки данных опросов: одновременные голоса ждут одну загрузку
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._known_users = LRUSet(known_users_size)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Растет при каждом сбросе кеша: данные, прочитанные до сброса, не кешируются
+        self._forget_epoch = 0
+
+    def forget_poll(self, poll_id: int):
+        """Сбрасывает закешированные данные опроса после его изменения."""
+        self._polls.pop(poll_id, None)
+        self._loading.pop(poll_id, None)
+        self._forget_epoch += 1
+
+    async def _poll_meta(self, poll_id: int):
+        cached = self._polls.get(poll_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached
+        loading = self._loading.get(poll_id)
+        if loading is None:
+            loading = self._loading[poll_id] = asyncio.ensure_future(self._load_poll_meta(poll_id))
+            loading.add_done_callback(
+                lambda task: self._loading.pop(poll_id) if self._loading.get(poll_id) is task else None
+            )
+        # Отмена одного голоса не должна прерывать загрузку для остальных
+        return await asyncio.shield(loading)
+
+    async def _load_poll_meta(self, poll_id: int):
+        epoch = self._forget_epoch
+        async with self._session_factory() as db:
+            poll = (await db.execute(
+                select(self._poll.id, self._poll.end_date).where(self._poll.id == poll_id)
+            )).first()
+            if poll is None:
+                return None
+            option_ids = (await db.scalars(
+                select(self._option.id).where(self._option.poll_id == poll_id).order_by(self._option.id)
+            )).all()
+        end_date = poll.end_date
+        if end_date is not None and end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        cached = (end_date, list(option_ids), time.monotonic() + self._poll_cache_ttl)
+        if epoch == self._forget_epoch:
+            self._polls[poll_id] = cached
+        return cached
+
+    async def submit(self, poll_id: int, user_id: int, option_index: int) -> str:
+        """Проверяет и ставит голос в очередь.
+
+        Возвращает "accepted" или "duplicate" после записи пачки.
+        """
+        meta = await self._poll_meta(poll_id)
+        if meta is None:
+            raise HTTPException(status_code=404, detail="Poll not found")
+
+        end_date, option_ids, _ = meta
+        if end_date is not None and end_date < datetime.now(timezone.utc):
+            raise HTTPException(status_code=400, detail="Poll has ended")
+        if not isinstance(option_index, int) or option_index < 0 or option_index >= len(option_ids):
+            raise HTTPException(status_code=400, detail="Invalid option index")
+
+        if self._stopping:
+            raise HTTPException(status_code=503, detail="Vote ingestion is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((poll_id, user_id, option_ids[option_index], future))
+        return await future
+
+    async def _missing_users(self, db, user_ids: Set[int]) -> Set[int]:
+        """Отсеивает пользователей, которых нет в БД; найденные запоминаются."""
+        unknown = {user_id for user_id in user_ids if user_id not in self._known_users}
+        if not unknown:
+            return set()
+        found = set((await db.scalars(
+            select(self._user.telegram_id).where(self._user.telegram_id.in_(unknown))
+        )).all())
+        for user_id in found:
+            self._known_users.add(user_id)
+        return unknown - found
+
+    async def _write_batch(self, batch):
+        Vote, PollOption = self._vote, self._option
+        async with self._session_factory() as db:
+            missing = await self._missing_users(db, {user_id for _, user_id, _, _ in batch})
+            # Повторный голос внутри одной пачки сразу считаем дубликатом
+            unique = {}
+            for poll_id, user_id, option_id, future in batch:
+                if user_id in missing:
+                    future.set_exception(HTTPException(status_code=404, detail="User not found"))
+                elif (poll_id, user_id) in unique:
+                    future.set_result("duplicate")
+                else:
+                    unique[(poll_id, user_id)] = (option_id, future)
+            if not unique:
+                return
+
+            now = datetime.now(timezone.utc)
+            rows = [
+                {"poll_id": poll_id, "user_id": user_id, "option_id": option_id, "created_at": now}
+                for (poll_id, user_id), (option_id, _) in unique.items()
+            ]
+            inserted = (await db.execute(
+                insert_ignore(Vote, index_elements=["poll_id", "user_id"])
+                .returning(Vote.poll_id, Vote.user_id, Vote.option_id),
+                rows
+            )).all()
+
+            # Вариант мог быть удален изменением опроса, пока голос ждал в
+            # очереди или проверялся по устаревшему кешу. Проверка идет в той
+            # же транзакции записи, строки вариантов блокируются до коммита
+            stale = set()
+            if inserted:
+                valid = set((await db.execute(
+                    select(PollOption.id, PollOption.poll_id)
+                    .where(PollOption.id.in_({option_id for _, _, option_id in inserted}))
+                    .with_for_update()
+                )).all())
+                stale = {(poll_id, user_id) for poll_id, user_id, option_id in inserted if (option_id, poll_id) not in valid}
+            if stale:
+                await db.execute(delete(Vote).where(tuple_(Vote.poll_id, Vote.user_id).in_(stale)))
+                inserted = [row for row in inserted if (row[0], row[1]) not in stale]
+
+            # Счетчики вариантов увеличиваем только на реально вставленные голоса
+            increments = Counter(option_id for _, _, option_id in inserted)
+            if increments:
+                await db.execute(
+                    update(PollOption.__table__)
+                    .where(PollOption.__table__.c.id == bindparam("b_option_id"))
+                    .values(votes_count=PollOption.__table__.c.votes_count + bindparam("b_increment")),
+                    [{"b_option_id": option_id, "b_increment": n} for option_id, n in increments.items()]
+                )
+            if inserted and self._on_write:
+                await self._on_write(db, {poll_id for poll_id, _, _ in inserted})
+            await db.commit()
+
+        for poll_id, user_id in stale:
+            self.forget_poll(poll_id)
+            unique.pop((poll_id, user_id))[1].set_exception(
+                HTTPException(status_code=409, detail="Poll options have changed, please vote again")
+            )
+        accepted = {(poll_id, user_id) for poll_id, user_id, _ in inserted}
+        for key, (_, future) in unique.items():
+            if not future.done():
+                future.set_result("accepted" if key in accepted else "duplicate")
+        if accepted and self._on_flush:
+            self._on_flush({poll_id for poll_id, _ in accepted})
+
+    async def _process(self, batch):
+        try:
+            await self._write_batch(batch)
+        except Exception as e:
+            logger.error(f"Error writing votes batch: {e}")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(HTTPException(status_code=500, detail="Vote was not recorded"))
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Даем накопиться пачке, если голос пришел в пустую очередь. Под
+            # нагрузкой пачка уже набралась за время записи предыдущей
+            if self._queue.empty():
+                await asyncio.sleep(self._max_delay)
+            while len(batch) < self._batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._process(batch)
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Записывает все принятые голоса и останавливает фоновую задачу.
+
+        Задача не отменяется: иначе пачка, которая уже пишется или ждет
+        в sleep, была бы потеряна, а ее вызывающие не получили бы ответа.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        # Голоса, поставленные в очередь после маркера остановки
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+        if batch:
+            await self._process(batch)
@@ -1,20 +1,38 @@
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from typing import List, Optional
-import json
-import hmac
-import urllib.parse
+import asyncio
 import logging
-from fastapi import FastAPI, Request, HTTPException, Depends
+import time
+import base64
+import hashlib
+import hmac
+import json
+import pickle
+import tempfile
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session, sessionmaker, relationship
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, UniqueConstraint, select, insert, update, delete, func, case, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field
-import python_jwt as jwt
-import os
-import hashlib
+import jwt
 from fastapi.middleware.cors import CORSMiddleware
+from config import settings
+from database import engine, write_engine, SessionLocal, get_db, read_session, replica_set, init_models, dispose_engine, insert_ignore
+from activity import ActivityBuffer
+from telegram_auth import TelegramAuth, AdminRegistry, resolve_telegram_auth
+from cache import Snapshot, ExpiringSet
+from search import EventSearch
+from live import PollBroadcaster
+from votes import VoteIngestor
+from ratelimit import RateLimiter, create_store
+from reminders import as_utc
+from transfer import iter_csv_records, iter_ndjson_records, csv_line, ndjson_line
+import metrics
+import profiling
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -39,10 +57,30 @@ class EventCreate(BaseModel):
     category: str = Field(default="other")
     created_by: Optional[int] = None
 
+# Модели ответов
+class EventResult(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    date: Optional[datetime] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+
+class PollOptionResult(BaseModel):
+    id: int
+    text: str
+    votes_count: int
+    votes_percentage: float
+
+class PollResult(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    end_date: datetime
+    created_by: Optional[int] = None
+    options: List[PollOptionResult]
+
 # Database setup
-DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Определение моделей базы данных
@@ -57,6 +95,11 @@ class User(Base):
     saved_events = relationship("SavedEvent", back_populates="user")
     votes = relationship("Vote", back_populates="user")
 
+    __table_args__ = (
+        # Индекс для постраничного вывода пользователей в админ-панели
+        Index("ix_users_last_active_id", "last_active", "id"),
+    )
+
 class Event(Base):
     __tablename__ = "events"
     id = Column(Integer, primary_key=True, index=True)
@@ -69,6 +112,12 @@ class Event(Base):
     created_by = Column(Integer, ForeignKey("users.telegram_id"))
     saved_by = relationship("SavedEvent", back_populates="event")
 
+    __table_args__ = (
+        # Индексы для выборок предстоящих/прошедших и фильтра по категории
+        Index("ix_events_date", "date"),
+        Index("ix_events_category_date", "category", "date"),
+    )
+
 class Poll(Base):
     __tablename__ = "polls"
     id = Column(Integer, primary_key=True, index=True)
@@ -77,13 +126,15 @@ class Poll(Base):
     end_date = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     created_by = Column(Integer, ForeignKey("users.telegram_id"))
-    options = relationship("PollOption", back_populates="poll")
+    options = relationship("PollOption", back_populates="poll", order_by="PollOption.id")
 
 class PollOption(Base):
     __tablename__ = "poll_options"
     id = Column(Integer, primary_key=True, index=True)
     poll_id = Column(Integer, ForeignKey("polls.id"))
     text = Column(String)
+    # Счетчик голосов, обновляется атомарно при голосовании
+    votes_count = Column(Integer, nullable=False, default=0, server_default="0")
     poll = relationship("Poll", back_populates="options")
     votes = relationship("Vote", back_populates="option")
 
@@ -91,11 +142,17 @@ class Vote(Base):
     __tablename__ = "votes"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.telegram_id"))
+    poll_id = Column(Integer, ForeignKey("polls.id"), index=True)
     option_id = Column(Integer, ForeignKey("poll_options.id"))
     created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     user = relationship("User", back_populates="votes")
     option = relationship("PollOption", back_populates="votes")
 
+    __table_args__ = (
+        # Один голос пользователя в опросе, на нем основана пакетная запись голосов
+        UniqueConstraint("poll_id", "user_id", name="uq_votes_poll_user"),
+    )
+
 class SavedEvent(Base):
     __tablename__ = "saved_events"
     id = Column(Integer, primary_key=True, index=True)
@@ -105,19 +162,124 @@ class SavedEvent(Base):
     user = relationship("User", back_populates="saved_events")
     event = relationship("Event", back_populates="saved_by")
 
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
+class CollectionVersion(Base):
+    __tablename__ = "collection_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Буфер обновлений времени последней активности
+activity_buffer = ActivityBuffer(SessionLocal, User.__table__, settings.ACTIVITY_FLUSH_INTERVAL)
 
-# Инициализация FastAPI
-app = FastAPI()
+# Проверка initData с заранее вычисленным секретным ключом
+telegram_auth = TelegramAuth(
+    settings.BOT_TOKEN,
+    max_age=settings.TELEGRAM_AUTH_MAX_AGE,
+    cache_size=settings.TELEGRAM_AUTH_CACHE_SIZE
+)
+
+# Администраторы из настроек и из БД, проверка без запросов к БД
+admin_registry = AdminRegistry(
+    SessionLocal, User, settings.ADMIN_USER_IDS, settings.ADMIN_CACHE_TTL
+)
+
+# Ограничение частоты запросов к эндпоинтам записи и авторизации
+rate_limiter = RateLimiter(create_store(settings.RATE_LIMIT_STORAGE_URL), [
+    ("POST", r"^/api/auth/init$", settings.RATE_LIMIT_AUTH),
+    ("POST", r"^/api/polls/\d+/vote$", settings.RATE_LIMIT_VOTE),
+    ("POST", r"^/api/events(/import)?$", settings.RATE_LIMIT_EVENTS),
+])
+
+# Снимок статистики для админ-панели: (версии коллекций, статистика)
+stats_snapshot = Snapshot(settings.STATS_CACHE_TTL)
+
+# Коллекции, версии которых хранятся в таблице collection_versions
+VERSIONED_COLLECTIONS = ("events", "polls")
+
+# Пользователи, недавно изменявшие данные: их чтения идут на основную БД
+recent_writers = ExpiringSet(settings.READ_YOUR_WRITES_WINDOW)
+
+async def bump_versions(db: AsyncSession, *names: str):
+    """Увеличивает версии коллекций в транзакции записи.
+
+    Версии хранятся в БД, а не в памяти процесса, поэтому запись,
+    принятая одним воркером, меняет ETag и снимок статистики во всех.
+    """
+    await db.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name.in_(names))
+        .values(version=CollectionVersion.version + 1)
+    )
+
+async def read_versions(db: AsyncSession) -> dict:
+    """Текущие версии коллекций.
+
+    Читаются до данных в той же сессии: версия увеличивается в одной
+    транзакции с изменением, поэтому прочитанные следом данные не старее
+    версии и ETag не закрепляется за устаревшим ответом.
+    """
+    return dict((await db.execute(select(CollectionVersion.name, CollectionVersion.version))).all())
+
+def listing_etag(request: Request, collection: str, version: int) -> str:
+    """Строгий ETag списка: версия коллекции, параметры запроса и интервал времени.
+
+    Интервал времени нужен, потому что мероприятия и опросы переходят
+    из предстоящих в прошедшие без изменения данных.
+    """
+    time_bucket = int(datetime.now(timezone.utc).timestamp() // settings.ETAG_TIME_BUCKET)
+    raw = "|".join([
+        collection,
+        str(version),
+        str(time_bucket),
+        str(request.query_params)
+    ])
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет заголовок If-None-Match."""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+# Полнотекстовый поиск по мероприятиям, бэкенд зависит от DATABASE_URL
+event_search = EventSearch(Event, engine.dialect.name, settings.SEARCH_LANGUAGE)
+
+# Инициализация FastAPI, ответы API сериализуются через orjson
+app = FastAPI(default_response_class=ORJSONResponse)
+
+@app.on_event("startup")
+async def on_startup():
+    # Создание таблиц
+    await init_models(Base.metadata)
+    async with write_engine.begin() as conn:
+        await conn.execute(
+            insert_ignore(CollectionVersion, index_elements=["name"]),
+            [{"name": name, "version": 0} for name in VERSIONED_COLLECTIONS]
+        )
+    await event_search.check(engine)
+    activity_buffer.start()
+    vote_ingestor.start()
+    await admin_registry.start()
+    await replica_set.start()
+
+    # В режиме webhook бот работает в этом же процессе и с тем же пулом БД
+    app.state.bot_application = None
+    if settings.BOT_MODE == "webhook":
+        import bot
+        app.state.bot_application = bot.build_application()
+        await bot.start_webhook(app.state.bot_application)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if app.state.bot_application is not None:
+        import bot
+        await bot.stop_webhook(app.state.bot_application)
+    await replica_set.stop()
+    await admin_registry.stop()
+    await vote_ingestor.stop()
+    await activity_buffer.stop()
+    await dispose_engine()
 
 # Настройка CORS
 app.add_middleware(
@@ -134,14 +296,6 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Настраиваем шаблоны
 templates = Jinja2Templates(directory="templates")
 
-# Зависимость для получения сессии БД
-def get_db():
-    db = Session(engine)
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Зависимость для проверки JWT токена
 def verify_token(request: Request) -> dict:
     token = request.headers.get('Authorization')
@@ -149,35 +303,53 @@ def verify_token(request: Request) -> dict:
         raise HTTPException(status_code=401, detail="Token not found")
     
     try:
-        payload = jwt.decode(token.split()[1], os.getenv("JWT_SECRET"), algorithms=["HS256"])
+        payload = jwt.decode(token.split()[1], settings.JWT_SECRET, algorithms=["HS256"])
         return payload
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 # Зависимость для проверки прав администратора
-def verify_admin(token_data: dict = Depends(verify_token), db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.telegram_id == token_data['user_id']).first()
-    if not user or not user.is_admin:
+def verify_admin(token_data: dict = Depends(verify_token)) -> int:
+    user_id = token_data['user_id']
+    if not admin_registry.is_admin(user_id):
         raise HTTPException(status_code=403, detail="Admin access required")
-    return user
+    return user_id
+
+def request_user_id(request: Request) -> Optional[int]:
+    """Telegram id пользователя из JWT или initData, если он известен."""
+    token = request.headers.get('Authorization')
+    if token:
+        try:
+            return jwt.decode(token.split()[-1], settings.JWT_SECRET, algorithms=["HS256"]).get('user_id')
+        except jwt.PyJWTError:
+            pass
+    auth = resolve_telegram_auth(request, telegram_auth)
+    if auth and isinstance(auth.get('user'), dict):
+        return auth['user'].get('id')
+    return None
+
+# Зависимость для эндпоинтов только на чтение. Списки с ETag и статистика
+# тоже читают реплику: версии коллекций читаются из той же реплики, что и
+# данные, поэтому отставание реплики не закрепляет новую версию за старыми данными
+async def get_read_db(request: Request):
+    # Сразу после своей записи пользователь читает с основной БД, а не с реплики
+    primary = bool(replica_set) and request_user_id(request) in recent_writers
+    async with read_session(primary=primary) as db:
+        yield db
 
 # Функция для проверки инициатора Telegram Web App
-async def verify_webapp_data(request: Request):
-    try:
-        data = await request.json()
-        user_id = data.get('user', {}).get('id')
-        if user_id:
-            return user_id in settings.ADMIN_USER_IDS
-        return False
-    except:
+def verify_webapp_data(request: Request) -> bool:
+    auth = resolve_telegram_auth(request, telegram_auth)
+    if not auth or not isinstance(auth.get('user'), dict):
         return False
+    return admin_registry.is_admin(auth['user'].get('id'))
 
 @app.get("/webapp")
 async def webapp(request: Request):
     """Главная страница веб-приложения"""
     is_admin = False
     try:
-        is_admin = await verify_webapp_data(request)
+        is_admin = verify_webapp_data(request)
     except:
         pass
     
@@ -189,7 +361,7 @@ async def webapp(request: Request):
 @app.get("/admin")
 async def admin_panel(request: Request):
     """Админ-панель"""
-    is_admin = await verify_webapp_data(request)
+    is_admin = verify_webapp_data(request)
     if not is_admin:
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     
@@ -240,7 +412,7 @@ async def get_past_events():
 @app.post("/api/admin/events")
 async def create_event(request: Request):
     """Создание нового мероприятия"""
-    is_admin = await verify_webapp_data(request)
+    is_admin = verify_webapp_data(request)
     if not is_admin:
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     
@@ -248,60 +420,107 @@ async def create_event(request: Request):
     # TODO: добавить сохранение в БД
     return {"status": "success", "message": "Мероприятие создано"}
 
+@app.post(settings.WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(request: Request):
+    """Принимает обновления от Telegram в режиме webhook."""
+    bot_application = request.app.state.bot_application
+    if bot_application is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    # compare_digest не принимает строки с не-ASCII символами, сравниваем байты
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(secret.encode(), settings.WEBHOOK_SECRET.encode()):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    
+    import bot
+    await bot.process_webhook_update(bot_application, await request.json())
+    return {"ok": True}
+
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "Event Management Bot API"}
 
-@app.get("/api/events")
+def month_range(type: str, month: int, year: Optional[int], now: datetime):
+    """Возвращает границы [начало, конец) месяца для фильтра по дате.
+
+    Если год не указан, берется ближайший такой месяц: для предстоящих
+    мероприятий - текущий или следующий год, для прошедших - текущий
+    или предыдущий.
+    """
+    if year is None:
+        year = now.year
+        if type == "upcoming" and month < now.month:
+            year += 1
+        elif type != "upcoming" and month > now.month:
+            year -= 1
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + (month == 12), month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+@app.get("/api/events", response_model=List[EventResult])
 async def get_events(
+    request: Request,
+    response: Response,
     type: str = "upcoming",
     category: Optional[str] = None,
-    month: Optional[int] = None,
+    month: Optional[int] = Query(default=None, ge=1, le=12),
+    # Граница сверху оставляет место для конца декабря в month_range
+    year: Optional[int] = Query(default=None, ge=1970, le=9998),
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Получает список мероприятий с фильтрацией."""
+    """Получает список мероприятий с фильтрацией.
+
+    С limit возвращает только первые limit мероприятий в порядке выдачи.
+    """
+    etag = listing_etag(request, "events", (await read_versions(db)).get("events", 0))
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
     now = datetime.now(timezone.utc)
-    query = db.query(Event)
+    # Выбираем только нужные колонки, без загрузки ORM-объектов
+    query = select(
+        Event.id, Event.title, Event.description, Event.date, Event.location, Event.category
+    )
 
     # Фильтр по типу (предстоящие/прошедшие)
     if type == "upcoming":
-        query = query.filter(Event.date >= now)
+        query = query.where(Event.date >= now)
     else:
-        query = query.filter(Event.date < now)
+        query = query.where(Event.date < now)
 
     # Фильтр по категории
     if category:
-        query = query.filter(Event.category == category)
+        query = query.where(Event.category == category)
 
-    # Фильтр по месяцу
+    # Фильтр по месяцу диапазоном дат, чтобы работал индекс по date
     if month is not None:
-        query = query.filter(func.extract('month', Event.date) == month)
+        start, end = month_range(type, month, year, now)
+        query = query.where(Event.date >= start, Event.date < end)
 
-    # Поиск по тексту
+    # Поиск по тексту, результаты упорядочены по релевантности
     if search:
-        search_filter = or_(
-            Event.title.ilike(f"%{search}%"),
-            Event.description.ilike(f"%{search}%"),
-            Event.location.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+        query = event_search.apply(query, search)
 
     # Сортировка
     if type == "upcoming":
         query = query.order_by(Event.date.asc())
     else:
         query = query.order_by(Event.date.desc())
+    if limit is not None:
+        query = query.limit(limit)
 
-    events = query.all()
+    events = (await db.execute(query)).mappings().all()
     return events
 
 @app.get("/api/events/all")
 async def get_all_events(
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_read_db),
+    _: int = Depends(verify_admin)
 ):
-    events = db.query(Event).order_by(Event.date).all()
+    events = (await db.scalars(select(Event).order_by(Event.date))).all()
     return [
         {
             "id": event.id,
@@ -316,10 +535,10 @@ async def get_all_events(
 @app.get("/api/events/{event_id}")
 async def get_event(
     event_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_read_db),
+    _: int = Depends(verify_admin)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
@@ -332,7 +551,7 @@ async def get_event(
     }
 
 @app.post("/api/events")
-async def create_event(event: EventCreate, db: Session = Depends(get_db)):
+async def create_event(event: EventCreate, db: AsyncSession = Depends(get_db)):
     """Создает новое мероприятие."""
     try:
         new_event = Event(
@@ -344,8 +563,9 @@ async def create_event(event: EventCreate, db: Session = Depends(get_db)):
             created_by=event.created_by
         )
         db.add(new_event)
-        db.commit()
-        db.refresh(new_event)
+        await bump_versions(db, "events")
+        await db.commit()
+        await db.refresh(new_event)
         
         # Возвращаем созданное мероприятие
         return {
@@ -358,17 +578,87 @@ async def create_event(event: EventCreate, db: Session = Depends(get_db)):
             "created_by": new_event.created_by
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/events/import")
+async def import_events(
+    request: Request,
+    format: Optional[str] = None,
+    _: int = Depends(verify_admin)
+):
+    """Массовый импорт мероприятий из CSV или NDJSON.
+
+    Тело запроса читается потоком, строки проверяются моделью EventCreate
+    и складываются пачками во временный файл. Ошибочные строки
+    пропускаются и перечисляются в ответе. Запись начинается только после
+    чтения всего тела, и каждая пачка вставляется своей короткой
+    транзакцией: медленная загрузка не держит единственного писателя
+    SQLite. Поэтому импорт не атомарен: если запись пачки не удалась,
+    уже вставленные пачки остаются, их число возвращается в ответе.
+    """
+    if format is None:
+        content_type = request.headers.get("Content-Type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    
+    records = iter_csv_records(request.stream()) if format == "csv" else iter_ndjson_records(request.stream())
+    batch_size = settings.IMPORT_BATCH_SIZE
+    batch = []
+    batches = 0
+    imported = 0
+    errors = []
+    row_number = 0
+    
+    with tempfile.TemporaryFile() as spool:
+        try:
+            async for record in records:
+                row_number += 1
+                try:
+                    data = json.loads(record) if format == "ndjson" else record
+                    # Пустые поля CSV считаем незаполненными
+                    data = {key: value for key, value in data.items() if value not in ("", None)}
+                    event = EventCreate(**data)
+                except Exception as e:
+                    errors.append({"row": row_number, "error": str(e)})
+                    continue
+                
+                batch.append(event.model_dump())
+                if len(batch) >= batch_size:
+                    pickle.dump(batch, spool)
+                    batches += 1
+                    batch = []
+        except Exception as e:
+            logger.error(f"Error reading events import: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        if batch:
+            pickle.dump(batch, spool)
+            batches += 1
+        
+        spool.seek(0)
+        for _ in range(batches):
+            batch = pickle.load(spool)
+            try:
+                async with SessionLocal() as db:
+                    await db.execute(insert(Event), batch)
+                    await bump_versions(db, "events")
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Error importing events: {e}")
+                raise HTTPException(status_code=400, detail={"error": str(e), "imported": imported})
+            imported += len(batch)
+    
+    return {"imported": imported, "failed": len(errors), "errors": errors}
+
 @app.put("/api/events/{event_id}")
 async def update_event(
     event_id: int,
     event: dict,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_db),
+    _: int = Depends(verify_admin)
 ):
-    db_event = db.query(Event).filter(Event.id == event_id).first()
+    db_event = await db.get(Event, event_id)
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
@@ -377,45 +667,163 @@ async def update_event(
     db_event.date = datetime.fromisoformat(event['date'])
     db_event.location = event['location']
     
-    db.commit()
+    await bump_versions(db, "events")
+    await db.commit()
     return {"message": "Event updated successfully"}
 
 @app.delete("/api/events/{event_id}")
 async def delete_event(
     event_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_db),
+    _: int = Depends(verify_admin)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    db.delete(event)
-    db.commit()
+    await db.delete(event)
+    await bump_versions(db, "events")
+    await db.commit()
     return {"message": "Event deleted successfully"}
 
-@app.get("/api/polls")
-async def get_polls(db: Session = Depends(get_db)):
+def format_poll_options(options) -> List[dict]:
+    """Варианты ответа с числом голосов и процентами."""
+    total_votes = sum(option.votes_count for option in options)
+    return [
+        {
+            "id": option.id,
+            "text": option.text,
+            "votes_count": option.votes_count,
+            "votes_percentage": (option.votes_count / total_votes * 100) if total_votes > 0 else 0
+        }
+        for option in options
+    ]
+
+async def load_polls_results(poll_ids) -> dict:
+    """Текущие результаты опросов одним запросом: {poll_id: результаты}."""
+    async with SessionLocal() as db:
+        options = (await db.execute(
+            select(PollOption.poll_id, PollOption.id, PollOption.text, PollOption.votes_count)
+            .where(PollOption.poll_id.in_(poll_ids))
+            .order_by(PollOption.poll_id, PollOption.id)
+        )).all()
+    grouped = {poll_id: [] for poll_id in poll_ids}
+    for option in options:
+        grouped[option.poll_id].append(option)
+    return {
+        poll_id: {"poll_id": poll_id, "options": format_poll_options(poll_options)}
+        for poll_id, poll_options in grouped.items()
+    }
+
+async def load_poll_results(poll_id: int) -> dict:
+    """Текущие результаты одного опроса для рассылки подписчикам."""
+    return (await load_polls_results([poll_id]))[poll_id]
+
+# Рассылка результатов опросов в реальном времени
+poll_broadcaster = PollBroadcaster(load_poll_results, settings.LIVE_COALESCE_INTERVAL)
+
+def votes_flushed(poll_ids):
+    """Вызывается после записи пачки голосов."""
+    for poll_id in poll_ids:
+        poll_broadcaster.publish(poll_id)
+
+# Пакетный прием голосов
+vote_ingestor = VoteIngestor(
+    SessionLocal,
+    (Poll, PollOption, Vote, User),
+    on_write=lambda db, poll_ids: bump_versions(db, "polls"),
+    on_flush=votes_flushed,
+    batch_size=settings.VOTE_BATCH_SIZE,
+    max_delay=settings.VOTE_BATCH_DELAY
+)
+
+@app.get("/api/polls", response_model=List[PollResult])
+async def get_polls(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
     """Получает список активных опросов."""
+    etag = listing_etag(request, "polls", (await read_versions(db)).get("polls", 0))
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
     now = datetime.now(timezone.utc)
-    polls = db.query(Poll).filter(Poll.end_date >= now).all()
+    polls = (await db.execute(
+        select(Poll.id, Poll.title, Poll.description, Poll.end_date, Poll.created_by)
+        .where(Poll.end_date >= now)
+    )).all()
+    if not polls:
+        return []
     
-    # Подсчитываем голоса для каждого варианта
-    for poll in polls:
-        total_votes = sum(len(option.votes) for option in poll.options)
-        for option in poll.options:
-            option_votes = len(option.votes)
-            option.votes_count = option_votes
-            option.votes_percentage = (option_votes / total_votes * 100) if total_votes > 0 else 0
+    # Варианты берем вместе с готовыми счетчиками, без загрузки голосов
+    options = (await db.execute(
+        select(PollOption.id, PollOption.poll_id, PollOption.text, PollOption.votes_count)
+        .where(PollOption.poll_id.in_([poll.id for poll in polls]))
+        .order_by(PollOption.id)
+    )).all()
+    options_by_poll = {}
+    for option in options:
+        options_by_poll.setdefault(option.poll_id, []).append(option)
     
-    return polls
+    return [
+        {
+            "id": poll.id,
+            "title": poll.title,
+            "description": poll.description,
+            "end_date": poll.end_date,
+            "created_by": poll.created_by,
+            "options": format_poll_options(options_by_poll.get(poll.id, []))
+        }
+        for poll in polls
+    ]
+
+MAX_LIVE_POLLS = 100
+
+@app.get("/api/polls/live")
+async def poll_live_results(ids: str = Query(..., description="id опросов через запятую")):
+    """Поток результатов нескольких опросов в одном соединении (Server-Sent Events)."""
+    try:
+        poll_ids = sorted({int(poll_id) for poll_id in ids.split(",") if poll_id.strip()})
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if not poll_ids or len(poll_ids) > MAX_LIVE_POLLS:
+        raise HTTPException(status_code=422, detail=f"Expected 1 to {MAX_LIVE_POLLS} poll ids")
+
+    async with SessionLocal() as db:
+        existing = set((await db.scalars(select(Poll.id).where(Poll.id.in_(poll_ids)))).all())
+    if len(existing) != len(poll_ids):
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    subscription = poll_broadcaster.subscribe(poll_ids)
+    
+    async def events():
+        try:
+            initial = await load_polls_results(poll_ids)
+            yield "".join(poll_broadcaster.format(results) for results in initial.values())
+            # Отключение клиента отслеживает StreamingResponse: генератор отменяется
+            # сам, поэтому на каждое сообщение не нужно вызывать is_disconnected()
+            while True:
+                try:
+                    messages = await asyncio.wait_for(subscription.get(), timeout=settings.LIVE_KEEPALIVE_INTERVAL)
+                    yield "".join(messages)
+                except asyncio.TimeoutError:
+                    # Комментарий SSE, чтобы прокси не закрывали соединение
+                    yield ": ping\n\n"
+        finally:
+            poll_broadcaster.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/polls/all")
 async def get_all_polls(
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_read_db),
+    _: int = Depends(verify_admin)
 ):
-    polls = db.query(Poll).order_by(Poll.end_date).all()
+    polls = (await db.scalars(
+        select(Poll).options(selectinload(Poll.options)).order_by(Poll.end_date)
+    )).all()
     return [
         {
             "id": poll.id,
@@ -430,10 +838,12 @@ async def get_all_polls(
 @app.get("/api/polls/{poll_id}")
 async def get_poll(
     poll_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_read_db),
+    _: int = Depends(verify_admin)
 ):
-    poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    poll = await db.scalar(
+        select(Poll).options(selectinload(Poll.options)).where(Poll.id == poll_id)
+    )
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
     
@@ -446,7 +856,7 @@ async def get_poll(
     }
 
 @app.post("/api/polls")
-async def create_poll(poll: PollCreate, db: Session = Depends(get_db)):
+async def create_poll(poll: PollCreate, db: AsyncSession = Depends(get_db)):
     """Создает новый опрос."""
     try:
         new_poll = Poll(
@@ -462,8 +872,8 @@ async def create_poll(poll: PollCreate, db: Session = Depends(get_db)):
             new_poll.options.append(poll_option)
         
         db.add(new_poll)
-        db.commit()
-        db.refresh(new_poll)
+        await bump_versions(db, "polls")
+        await db.commit()
         
         # Возвращаем созданный опрос
         return {
@@ -475,171 +885,90 @@ async def create_poll(poll: PollCreate, db: Session = Depends(get_db)):
             "options": [{"id": opt.id, "text": opt.text} for opt in new_poll.options]
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/api/polls/{poll_id}")
 async def update_poll(
     poll_id: int,
     poll: dict,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_db),
+    _: int = Depends(verify_admin)
 ):
-    db_poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    db_poll = await db.scalar(
+        select(Poll).options(selectinload(Poll.options)).where(Poll.id == poll_id)
+    )
     if not db_poll:
         raise HTTPException(status_code=404, detail="Poll not found")
     
-    # Сохраняем текущие голоса
-    current_votes = {opt["text"]: opt["votes"] for opt in db_poll.options}
+    # Сохраняем текущие варианты вместе с их голосами
+    current_options = {opt.text: opt for opt in db_poll.options}
     
     # Обновляем опрос, сохраняя голоса для существующих опций
     db_poll.title = poll['title']
     db_poll.description = poll['description']
     db_poll.end_date = datetime.fromisoformat(poll['endDate'])
+    new_texts = [opt["text"] for opt in poll['options']]
+    removed_ids = [opt.id for text, opt in current_options.items() if text not in new_texts]
+    if removed_ids:
+        await db.execute(delete(Vote).where(Vote.option_id.in_(removed_ids)))
     db_poll.options = [
-        {
-            "text": opt["text"],
-            "votes": current_votes.get(opt["text"], 0)
-        }
-        for opt in poll['options']
+        current_options.get(text) or PollOption(text=text)
+        for text in new_texts
     ]
     
-    db.commit()
+    await bump_versions(db, "polls")
+    await db.commit()
+    vote_ingestor.forget_poll(poll_id)
+    poll_broadcaster.publish(poll_id)
     return {"message": "Poll updated successfully"}
 
 @app.delete("/api/polls/{poll_id}")
 async def delete_poll(
     poll_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(verify_admin)
+    db: AsyncSession = Depends(get_db),
+    _: int = Depends(verify_admin)
 ):
-    poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    poll = await db.get(Poll, poll_id)
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
     
-    # Удаляем все голоса для этого опроса
-    db.query(Vote).filter(Vote.poll_id == poll_id).delete()
-    db.delete(poll)
-    db.commit()
+    # Удаляем все голоса и варианты для этого опроса
+    await db.execute(delete(Vote).where(Vote.poll_id == poll_id))
+    await db.execute(delete(PollOption).where(PollOption.poll_id == poll_id))
+    await db.delete(poll)
+    await bump_versions(db, "polls")
+    await db.commit()
+    vote_ingestor.forget_poll(poll_id)
     return {"message": "Poll deleted successfully"}
 
 @app.post("/api/polls/{poll_id}/vote")
 async def vote_in_poll(
     poll_id: int,
     vote: dict,
-    db: Session = Depends(get_db),
     token_data: dict = Depends(verify_token)
 ):
-    user = db.query(User).filter(User.telegram_id == token_data['user_id']).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Проверяем, существует ли опрос и не закончился ли он
-    poll = db.query(Poll).filter(Poll.id == poll_id).first()
-    if not poll:
-        raise HTTPException(status_code=404, detail="Poll not found")
-    
-    if poll.end_date < datetime.now(timezone.utc):
-        raise HTTPException(status_code=400, detail="Poll has ended")
-    
-    # Проверяем, не голосовал ли пользователь уже
-    existing_vote = db.query(Vote).filter(
-        and_(Vote.poll_id == poll_id, Vote.user_id == user.id)
-    ).first()
-    
-    if existing_vote:
+    # Проверка и запись голоса выполняются пакетно
+    status = await vote_ingestor.submit(poll_id, token_data['user_id'], vote.get('optionIndex'))
+    if status == "duplicate":
         raise HTTPException(status_code=400, detail="User has already voted")
     
-    # Проверяем корректность индекса опции
-    option_index = vote['optionIndex']
-    if option_index < 0 or option_index >= len(poll.options):
-        raise HTTPException(status_code=400, detail="Invalid option index")
-    
-    # Создаем запись о голосе
-    new_vote = Vote(
-        poll_id=poll_id,
-        user_id=user.id,
-        option_index=option_index
-    )
-    db.add(new_vote)
-    
-    # Увеличиваем счетчик голосов для выбранной опции
-    poll.options[option_index]['votes'] += 1
-    
-    db.commit()
-    return {"message": "Vote recorded successfully"}
-
-def parse_init_data(init_data: str) -> dict:
-    """Парсит init data из Telegram Web App."""
-    try:
-        # Декодируем URL-encoded строку
-        decoded = urllib.parse.unquote(init_data)
-        # Разбиваем на параметры
-        params = dict(urllib.parse.parse_qsl(decoded))
-        # Если есть user в виде строки, преобразуем в словарь
-        if 'user' in params and isinstance(params['user'], str):
-            params['user'] = json.loads(params['user'])
-        return params
-    except Exception as e:
-        logger.error(f"Error parsing init data: {e}")
-        return {}
-
-def verify_telegram_data(init_data: str) -> bool:
-    """Проверяет подпись данных от Telegram."""
-    try:
-        # Получаем параметры
-        params = dict(urllib.parse.parse_qsl(init_data))
-        
-        # Получаем хэш
-        hash_value = params.pop('hash', None)
-        if not hash_value:
-            return False
-            
-        # Сортируем оставшиеся параметры
-        data_check_string = '\n'.join(f'{k}={v}' for k, v in sorted(params.items()))
-        
-        # Создаем HMAC с использованием токена бота
-        secret_key = hmac.new(
-            key=os.getenv('BOT_TOKEN', '').encode(),
-            msg='WebAppData'.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
-        
-        # Проверяем подпись
-        signature = hmac.new(
-            key=secret_key,
-            msg=data_check_string.encode(),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-        
-        return signature == hash_value
-    except Exception as e:
-        logger.error(f"Error verifying Telegram data: {e}")
-        return False
+    return {"message": "Vote recorded successfully", "status": status}
 
 @app.post("/api/auth/init")
-async def init_user(request: Request, db: Session = Depends(get_db)):
+async def init_user(request: Request, db: AsyncSession = Depends(get_db)):
     """Инициализирует пользователя при первом входе в приложение."""
     try:
-        # Получаем init_data из разных возможных источников
-        init_data = request.query_params.get("initData")
-        if not init_data:
-            init_data = request.headers.get("X-Telegram-Init-Data")
+        # Проверяем подпись данных (результат уже мог быть получен в middleware)
+        user_data = resolve_telegram_auth(request, telegram_auth)
+        if user_data is None:
+            raise HTTPException(status_code=400, detail="Invalid or missing init data")
             
-        if not init_data:
-            raise HTTPException(status_code=400, detail="No init data provided")
-        
-        # Проверяем подпись данных
-        if not verify_telegram_data(init_data):
-            raise HTTPException(status_code=400, detail="Invalid init data signature")
-            
-        # Парсим данные пользователя
-        user_data = parse_init_data(init_data)
-        if not user_data or "user" not in user_data:
+        if "user" not in user_data:
             raise HTTPException(status_code=400, detail="Invalid init data format")
             
         tg_user = user_data["user"]
-        user = db.query(User).filter(User.telegram_id == tg_user["id"]).first()
+        user = await db.scalar(select(User).where(User.telegram_id == tg_user["id"]))
         
         if not user:
             # Создаем нового пользователя
@@ -656,7 +985,7 @@ async def init_user(request: Request, db: Session = Depends(get_db)):
             user.last_active = datetime.now(timezone.utc)
             logger.info(f"Updated user activity: {tg_user['id']}")
             
-        db.commit()
+        await db.commit()
         return {"success": True, "user_id": tg_user["id"]}
         
     except Exception as e:
@@ -664,44 +993,53 @@ async def init_user(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/stats")
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(db: AsyncSession = Depends(get_read_db)):
     """Получает статистику для админ-панели."""
+    # Снимок годен, пока версии мероприятий и опросов не выросли
+    versions = await read_versions(db)
+    snapshot = stats_snapshot.get()
+    if snapshot is not None and all(snapshot[0].get(name, 0) >= version for name, version in versions.items()):
+        return snapshot[1]
+
     now = datetime.now(timezone.utc)
     
-    # Статистика мероприятий
-    total_events = db.query(func.count(Event.id)).scalar()
-    upcoming_events = db.query(func.count(Event.id)).filter(Event.date >= now).scalar()
-    past_events = db.query(func.count(Event.id)).filter(Event.date < now).scalar()
+    # Статистика мероприятий: один GROUP BY с условными счетчиками
+    events_by_category = (await db.execute(
+        select(
+            Event.category,
+            func.count(Event.id),
+            func.count(case((Event.date >= now, Event.id))),
+            func.count(case((Event.date < now, Event.id)))
+        ).group_by(Event.category)
+    )).all()
     
-    # Статистика опросов
-    total_polls = db.query(func.count(Poll.id)).scalar()
-    active_polls = db.query(func.count(Poll.id)).filter(Poll.end_date >= now).scalar()
-    completed_polls = db.query(func.count(Poll.id)).filter(Poll.end_date < now).scalar()
-    
-    # Статистика пользователей
-    total_users = db.query(func.count(User.id)).scalar()
-    active_today = db.query(func.count(User.id)).filter(
-        User.last_active >= now - timedelta(days=1)
-    ).scalar()
-    new_this_week = db.query(func.count(User.id)).filter(
-        User.created_at >= now - timedelta(days=7)
-    ).scalar()
+    # Статистика опросов, голосов и пользователей одним запросом
+    totals = (await db.execute(
+        select(
+            select(func.count(Poll.id)).scalar_subquery(),
+            select(func.count(case((Poll.end_date >= now, Poll.id)))).scalar_subquery(),
+            select(func.count(case((Poll.end_date < now, Poll.id)))).scalar_subquery(),
+            select(func.count(Vote.id)).scalar_subquery(),
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(case((User.last_active >= now - timedelta(days=1), User.id)))).scalar_subquery(),
+            select(func.count(case((User.created_at >= now - timedelta(days=7), User.id)))).scalar_subquery()
+        )
+    )).one()
+    (total_polls, active_polls, completed_polls, total_votes,
+     total_users, active_today, new_this_week) = totals
     
-    return {
+    stats = {
         "events": {
-            "total": total_events,
-            "upcoming": upcoming_events,
-            "past": past_events,
-            "by_category": db.query(
-                Event.category,
-                func.count(Event.id)
-            ).group_by(Event.category).all()
+            "total": sum(row[1] for row in events_by_category),
+            "upcoming": sum(row[2] for row in events_by_category),
+            "past": sum(row[3] for row in events_by_category),
+            "by_category": [[row[0], row[1]] for row in events_by_category]
         },
         "polls": {
             "total": total_polls,
             "active": active_polls,
             "completed": completed_polls,
-            "total_votes": db.query(func.count(Vote.id)).scalar()
+            "total_votes": total_votes
         },
         "users": {
             "total": total_users,
@@ -709,72 +1047,293 @@ async def get_stats(db: Session = Depends(get_db)):
             "new_this_week": new_this_week
         }
     }
+    stats_snapshot.set((versions, stats))
+    return stats
+
+def encode_users_cursor(last_active: Optional[datetime], user_id: int) -> str:
+    """Кодирует позицию (last_active, id) для постраничного вывода.
+
+    Пустое время означает позицию среди никогда не заходивших пользователей.
+    """
+    raw = f"{last_active.isoformat() if last_active else ''}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_users_cursor(cursor: str):
+    """Декодирует позицию, полученную из encode_users_cursor."""
+    try:
+        last_active, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(last_active) if last_active else None), int(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_users_page(db: AsyncSession, limit: int, after=None):
+    """Страница пользователей по убыванию (last_active, id), NULL в конце.
+
+    Сначала идут заходившие пользователи, затем никогда не заходившие
+    (last_active IS NULL) по убыванию id. Каждая часть читается своим
+    запросом по индексу (last_active, id): условие с OR и NULLS LAST
+    заставило бы базу пролистывать все предыдущие страницы.
+    """
+    columns = (User.id, User.telegram_id, User.username, User.last_active)
+    rows = []
+    if after is None or after[0] is not None:
+        query = (
+            select(*columns)
+            .where(User.last_active.is_not(None))
+            .order_by(User.last_active.desc(), User.id.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(tuple_(User.last_active, User.id) < after)
+        rows = (await db.execute(query)).all()
+        # Хвост без активности читается с начала
+        after = None
+    if len(rows) < limit:
+        query = (
+            select(*columns)
+            .where(User.last_active.is_(None))
+            .order_by(User.id.desc())
+            .limit(limit - len(rows))
+        )
+        if after is not None:
+            query = query.where(User.id < after[1])
+        rows += (await db.execute(query)).all()
+    return rows
+
+def format_user_row(row, now: datetime) -> dict:
+    """Форматирует пользователя с учетом еще не записанной активности."""
+    last_active = as_utc(row.last_active) if row.last_active else None
+    pending = activity_buffer.get(row.telegram_id)
+    if pending and (not last_active or pending > last_active):
+        last_active = pending
+    time_diff = (now - last_active).total_seconds() if last_active else float('inf')
+    return {
+        "id": row.telegram_id,
+        "username": row.username,
+        "last_active": last_active.isoformat() if last_active else None,
+        "is_active": time_diff < 300  # 5 минут
+    }
+
+async def stream_users_ndjson(page_size: int):
+    """Построчно отдает всех пользователей в формате NDJSON."""
+    after = None
+    async with read_session() as db:
+        while True:
+            rows = await fetch_users_page(db, page_size, after)
+            if not rows:
+                break
+            now = datetime.now(timezone.utc)
+            yield "".join(json.dumps(format_user_row(row, now)) + "\n" for row in rows)
+            after = (rows[-1].last_active, rows[-1].id)
 
 @app.get("/api/admin/users")
-async def get_users_stats(db: Session = Depends(get_db)):
-    """Получает статистику пользователей для админ-панели."""
+async def get_users_stats(
+    request: Request,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = "json",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получает статистику пользователей для админ-панели.
+
+    Возвращает страницу пользователей и курсор следующей страницы.
+    С format=ndjson выгружает всех пользователей потоком.
+    """
+    if format == "ndjson":
+        # Полная выгрузка доступна только администраторам, как и /api/admin/export
+        verify_admin(verify_token(request))
+        return StreamingResponse(stream_users_ndjson(limit), media_type="application/x-ndjson")
+
     try:
         now = datetime.now(timezone.utc)
-        logger.info("Fetching users list")
+        after = decode_users_cursor(cursor) if cursor else None
         
-        # Получаем всех пользователей
-        users = db.query(User).order_by(User.last_active.desc()).all()
-        logger.info(f"Found {len(users)} users")
+        rows = await fetch_users_page(db, limit, after)
+        logger.debug(f"Fetched {len(rows)} users")
         
-        # Форматируем данные для ответа
-        users_data = []
-        for user in users:
-            time_diff = (now - user.last_active).total_seconds() if user.last_active else float('inf')
-            is_active = time_diff < 300  # 5 минут
-            
-            user_data = {
-                "id": user.telegram_id,
-                "username": user.username,
-                "last_active": user.last_active.isoformat() if user.last_active else None,
-                "is_active": is_active
-            }
-            users_data.append(user_data)
-            
-            # Логируем статус каждого пользователя
-            logger.info(f"User {user.telegram_id} status: active={is_active}, last_active={user.last_active}")
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_users_cursor(rows[-1].last_active, rows[-1].id)
         
         return {
-            "users": users_data
+            "users": [format_user_row(row, now) for row in rows],
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting users stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Запросы для выгрузки данных администратором
+EXPORT_QUERIES = {
+    "events": lambda: select(
+        Event.id, Event.title, Event.description, Event.date,
+        Event.location, Event.category, Event.created_by, Event.created_at
+    ).order_by(Event.id),
+    "polls": lambda: select(
+        Poll.id.label("poll_id"), Poll.title, Poll.description, Poll.end_date, Poll.created_by,
+        PollOption.id.label("option_id"), PollOption.text.label("option_text"),
+        PollOption.votes_count.label("option_votes_count")
+    ).outerjoin(PollOption, PollOption.poll_id == Poll.id).order_by(Poll.id, PollOption.id),
+    "votes": lambda: select(
+        Vote.id, Vote.poll_id, Vote.option_id, Vote.user_id, Vote.created_at
+    ).order_by(Vote.id),
+}
+
+async def stream_export(query, format: str):
+    """Отдает результат запроса потоком, читая его серверным курсором."""
+    async with read_session() as db:
+        result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if format == "csv":
+            yield csv_line(columns)
+        async for rows in result.partitions():
+            if format == "csv":
+                yield "".join(csv_line(row) for row in rows)
+            else:
+                yield "".join(ndjson_line(columns, row) for row in rows)
+
+@app.get("/api/admin/export/{entity}")
+async def export_data(
+    entity: str,
+    format: str = "csv",
+    _: int = Depends(verify_admin)
+):
+    """Выгрузка мероприятий, опросов с вариантами или голосов в CSV/NDJSON."""
+    if entity not in EXPORT_QUERIES:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(EXPORT_QUERIES[entity](), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{format}"'}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Метрики в текстовом формате Prometheus."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.middleware("http")
 async def update_user_activity(request: Request, call_next):
     """Обновляет время последней активности пользователя."""
     try:
-        # Получаем init_data из разных возможных источников
-        init_data = None
+        user_data = None
         if "Telegram-Web-App" in request.headers.get("User-Agent", ""):
-            # Пробуем получить из query параметров
-            init_data = request.query_params.get("initData")
-            if not init_data:
-                # Пробуем получить из заголовков
-                init_data = request.headers.get("X-Telegram-Init-Data")
+            # Проверенные данные сохраняются в request.state для обработчиков
+            user_data = resolve_telegram_auth(request, telegram_auth)
                 
-        if init_data:
-            logger.info(f"Received init data: {init_data[:100]}...")  # Логируем для отладки
-            user_data = parse_init_data(init_data)
-            if user_data and "user" in user_data:
+        if user_data:
+            if "user" in user_data:
                 user_id = user_data["user"].get("id")
                 if user_id:
-                    logger.info(f"Updating activity for user {user_id}")
-                    db = next(get_db())
-                    user = db.query(User).filter(User.telegram_id == user_id).first()
-                    if user:
-                        user.last_active = datetime.now(timezone.utc)
-                        db.commit()
-                        logger.info(f"Activity updated for user {user_id}")
-                    else:
-                        logger.warning(f"User {user_id} not found in database")
+                    # Запись в БД выполняется пачкой в фоне
+                    activity_buffer.touch(user_id)
     except Exception as e:
         logger.error(f"Error in activity middleware: {e}")
     
     response = await call_next(request)
-    return response 
\ No newline at end of file
+    return response
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """Отклоняет запросы сверх бюджета до любой работы с БД."""
+    rule = rate_limiter.match(request.method, request.url.path)
+    if rule is None:
+        return await call_next(request)
+    
+    # Ключ - пользователь из JWT или initData, IP только для анонимных запросов
+    user_id = request_user_id(request)
+    if user_id is not None:
+        identity = f"user:{user_id}"
+    else:
+        identity = f"ip:{request.client.host if request.client else 'unknown'}"
+    
+    name, limit, window = rule
+    retry_after = await rate_limiter.hit(name, identity, limit, window)
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too Many Requests"},
+            headers={"Retry-After": str(retry_after)}
+        )
+    return await call_next(request)
+
+async def track_writes(request: Request, call_next):
+    """Запоминает пользователей, успешно изменивших данные (read-your-writes)."""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        user_id = request_user_id(request)
+        if user_id is not None:
+            recent_writers.add(user_id)
+    return response
+
+# Без реплик все чтения идут в основную БД, и отслеживать записи не нужно
+if replica_set:
+    app.middleware("http")(track_writes)
+
+class CollectMetricsMiddleware:
+    """Собирает задержку запросов и время работы с БД по маршрутам.
+
+    Чистый ASGI-слой: замер заканчивается после отправки всего тела
+    ответа, поэтому потоковые ответы (SSE, выгрузки) учитывают запросы к
+    БД, выполненные во время передачи, и не создают лишних задач anyio,
+    как @app.middleware("http").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        metrics.HTTP_REQUESTS_IN_PROGRESS.inc(method)
+        # Счетчики запросов к БД заполняются хуками SQLAlchemy в metrics.py
+        db_stats = [0, 0.0]
+        token = metrics.request_db_stats.set(db_stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.request_db_stats.reset(token)
+            metrics.HTTP_REQUESTS_IN_PROGRESS.dec(method)
+            # Шаблон пути маршрута, а не сам путь, чтобы не плодить метки;
+            # маршрутизатор записывает его в общий scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            metrics.HTTP_REQUEST_DURATION.observe(elapsed, method, route_path, str(status))
+            metrics.DB_QUERIES_PER_REQUEST.observe(db_stats[0], route_path)
+            metrics.DB_TIME_PER_REQUEST.observe(db_stats[1], route_path)
+
+app.add_middleware(CollectMetricsMiddleware)
+
+async def profile_sql(request: Request, call_next):
+    """Записывает запросы к БД за HTTP-запрос и ищет повторяющиеся (N+1)."""
+    profile = profiling.RequestProfile()
+    token = profiling.current_profile.set(profile)
+    try:
+        response = await call_next(request)
+    finally:
+        profiling.current_profile.reset(token)
+    profiling.report(profile, request.method, request.url.path, settings.N_PLUS_ONE_THRESHOLD)
+    response.headers["X-SQL-Profile"] = profile.summary(settings.N_PLUS_ONE_THRESHOLD)
+    return response
+
+# Профилирование SQL включается только явно (SQL_PROFILE=1)
+if settings.SQL_PROFILE:
+    app.middleware("http")(profile_sql)